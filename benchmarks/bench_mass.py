@@ -0,0 +1,83 @@
+"""
+Benchmark of the lumped (HRZ) against the consistent mass matrix on regular frames,
+in solution time and error of the lowest natural frequencies.
+
+Usage: python benchmarks/bench_mass.py --bays 4 --storeys 6 --subdivisions 1 2 4 8 -k 10 --engine sparse
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'eigenHelper'))
+
+from utils import *
+import engine
+
+def frameModelDict(nbays, nstoreys, nsub=1, span=6.0, height=3.5, E=3e10, A=0.09, I=6.75e-4, rho=2500):
+    """
+    Returns the model dictionary of a frame fixed at the base, with every member divided into nsub elements
+    """
+    nodes = {(i*nsub, j) for i in range(nbays+1) for j in range(nstoreys*nsub+1)} | \
+        {(i, j*nsub) for i in range(nbays*nsub+1) for j in range(1, nstoreys+1)}
+    grid = sorted(nodes, key=lambda ij: (ij[1], ij[0]))
+    ids = {ij:n+1 for n, ij in enumerate(grid)}
+    members = [((i*nsub, j), (i*nsub, j+1)) for i in range(nbays+1) for j in range(nstoreys*nsub)] + \
+        [((i, j*nsub), (i+1, j*nsub)) for i in range(nbays*nsub) for j in range(1, nstoreys+1)]
+    nel = len(members)
+    return {
+        'nodes':{'id':list(ids.values()), 'x':[i*span/nsub for i, _ in grid], 'y':[j*height/nsub for _, j in grid]},
+        'elements':{'id':list(range(1, nel+1)), 'na':[ids[a] for a, _ in members], 'nb':[ids[b] for _, b in members], \
+            'E':[E]*nel, 'A':[A]*nel, 'I':[I]*nel, 'rho':[rho]*nel},
+        'supports':{'node':[ids[(i*nsub, 0)] for i in range(nbays+1)], 'type':['S1']*(nbays+1)}
+    }
+
+def solveFrame(data, massType, engineName='sparse', nmodes=10, repeat=3):
+    """
+    Returns the number of dofs, the lowest nmodes frequencies and the best solution time [s] of the frame
+    """
+    model = engine.Model.fromDict(data)
+    model.setMassType(massType)
+    model.assemble()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.solve(engineName, nmodes)
+        seconds.append(time.perf_counter() - start)
+    return model.eset.ndof, model.getFrequencies()[:nmodes], min(seconds)
+
+def benchmarkMass(nbays, nstoreys, subdivisions, engineName='sparse', nmodes=10, repeat=3):
+    """
+    Returns the solution times [s] and largest frequency errors of both mass formulations per subdivision,
+    with respect to the consistent mass with twice the finest subdivision
+    """
+    _, reference, _ = solveFrame(frameModelDict(nbays, nstoreys, 2*max(subdivisions)), 'consistent', 'sparse', nmodes, 1)
+    rows = []
+    for nsub in subdivisions:
+        data = frameModelDict(nbays, nstoreys, nsub)
+        ndof, fc, tc = solveFrame(data, 'consistent', engineName, nmodes, repeat)
+        _, fl, tl = solveFrame(data, 'lumped', engineName, nmodes, repeat)
+        rows.append({'nsub':nsub, 'ndof':ndof, 'consistentSeconds':tc, 'lumpedSeconds':tl, \
+            'consistentError':np.max(np.abs(fc/reference - 1)), 'lumpedError':np.max(np.abs(fl/reference - 1))})
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the lumped and consistent mass matrices in accuracy and speed")
+    parser.add_argument('--bays', type=int, default=4, help="number of bays of the frame (default: 4)")
+    parser.add_argument('--storeys', type=int, default=6, help="number of storeys of the frame (default: 6)")
+    parser.add_argument('--subdivisions', type=int, nargs='+', default=[1, 2, 4, 8], \
+        help="numbers of elements per member (default: 1 2 4 8)")
+    parser.add_argument('--engine', choices=['dense', 'sparse'], default='sparse', help="eigensolver (default: sparse)")
+    parser.add_argument('-k', '--nmodes', type=int, default=10, help="number of compared modes (default: 10)")
+    parser.add_argument('--repeat', type=int, default=3, help="solutions per timing, the best is reported (default: 3)")
+    args = parser.parse_args(argv)
+
+    rows = benchmarkMass(args.bays, args.storeys, args.subdivisions, args.engine, args.nmodes, args.repeat)
+    print(f"{args.bays} x {args.storeys} frame, lowest {args.nmodes} modes, {args.engine} engine")
+    print(f"{'nsub':>5} {'ndof':>7} {'consistent [s]':>15} {'lumped [s]':>11} {'speedup':>8} {'consistent err':>15} {'lumped err':>11}")
+    for row in rows:
+        print(f"{row['nsub']:>5} {row['ndof']:>7} {row['consistentSeconds']:>15.4f} {row['lumpedSeconds']:>11.4f} " + \
+            f"{row['consistentSeconds']/row['lumpedSeconds']:>8.2f} {row['consistentError']:>15.2e} {row['lumpedError']:>11.2e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Benchmark of the mode shape transport to the browser: bytes and server time per mode change
+of the legacy multi_line payload and the flat NaN-separated float32 arrays of solver.updateSolutionData.
+
+Usage: python benchmarks/bench_mode_transport.py --bays 30 --storeys 33
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'eigenHelper'))
+
+import numpy as np
+from bokeh.core.json_encoder import serialize_json
+from bokeh.util.serialization import transform_column_source_data
+from node import NodeSet, createNode
+from element import ElementSet, createElement
+from bc import SupportSet, createSupport
+import solver
+import plot
+import howto
+
+PROPERTIES = {'E':3e10, 'rho':2500, 'A':0.1030e-2, 'I':0.0171e-4}
+
+def buildFrame(nbays, nstoreys, width=4.0, height=3.0):
+    nset, eset, sset = NodeSet(), ElementSet(), SupportSet()
+    for j in range(nstoreys+1):
+        for i in range(nbays+1):
+            nid = j*(nbays+1) + i + 1
+            nset.add(createNode(nset, i*width, j*height, nid))
+    nset.assignDOFs()
+    eid = 1
+    for j in range(nstoreys+1):
+        for i in range(nbays+1):
+            nid = j*(nbays+1) + i + 1
+            neighbours = ([nid+1] if i < nbays else []) + ([nid+nbays+1] if j < nstoreys else [])
+            if j == 0:
+                neighbours = neighbours[-1:]
+            for nb in neighbours:
+                eset.add(createElement(eset, nset, eid, nset.getEntityWithID(nid), nset.getEntityWithID(nb), dict(PROPERTIES)))
+                eid += 1
+    eset.setNdof()
+    for i in range(nbays+1):
+        sset.add(createSupport(nset, 0, nset.getEntityWithID(i+1)))
+    return nset, eset, sset
+
+def payloadSize(data):
+    buffers = []
+    encoded = serialize_json(transform_column_source_data(data, buffers=buffers))
+    return len(encoded) + sum(len(buf) for _, buf in buffers)
+
+def legacyPayload(solution, eigenmode):
+    exc, eyc = solver.getDeformedShape(solution, eigenmode)
+    return {'x':[exc[i,:] for i in range(exc.shape[0])], 'y':[eyc[i,:] for i in range(eyc.shape[0])]}
+
+def flatPayload(solution, eigenmode):
+    exc, eyc = solver.getDeformedShape(solution, eigenmode)
+    return {'x':solver.flattenLines(exc), 'y':solver.flattenLines(eyc)}
+
+def measure(makePayload, solution, nmodes):
+    sizes, times = [], []
+    for mode in range(1, nmodes+1):
+        start = time.perf_counter()
+        sizes.append(payloadSize(makePayload(solution, mode)))
+        times.append(time.perf_counter() - start)
+    return np.mean(sizes), 1e3*np.mean(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the mode shape payloads sent to the browser")
+    parser.add_argument('--bays', type=int, default=30, help="number of bays of the frame (default: 30)")
+    parser.add_argument('--storeys', type=int, default=33, help="number of storeys of the frame (default: 33)")
+    args = parser.parse_args(argv)
+
+    nset, eset, sset = buildFrame(args.bays, args.storeys)
+    eset.assemble()
+    solModule = solver.createSolverLayout()
+    solModule['engineSelect'].value = 'Sparse (lowest modes)'
+    solModule['nModesWidget'].value = 10
+    _, _, _, _, _, modeCDS = plot.createPlotLayout(nset, eset, sset, solModule)
+    solver.solveOnClick({'eset':eset}, {'sset':sset}, solModule, howto.createHowToLayout(), modeCDS)
+    solution = solModule['solution']
+    nmodes = solution['eigenvalues'].shape[0]
+    print(f"Model: {eset.getSize()} elements, {eset.ndof} dofs, {nmodes} modes")
+    print(f"{'transport':<32}{'bytes/mode change':>20}{'ms/mode change':>18}")
+    for name, makePayload in [('multi_line, float64 lists', legacyPayload), ('flat NaN-separated float32', flatPayload)]:
+        size, ms = measure(makePayload, solution, nmodes)
+        print(f"{name:<32}{size:>20.0f}{ms:>18.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Convergence of the lowest natural frequencies of a model file when its elements are subdivided at assembly.
+
+Usage: python benchmarks/bench_subdivision.py model.json --subdivisions 1 2 4 8 16 -k 10 --engine sparse
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'eigenHelper'))
+
+from utils import *
+import engine
+import modelfile
+
+def subdivisionConvergence(data, subdivisions, engineName='sparse', nmodes=10):
+    """
+    Returns the number of dofs, the assembly and solution time [s], the lowest nmodes frequencies and
+    their largest relative change from the previous subdivision (NaN for the first) per subdivision
+    """
+    rows = []
+    previous = None
+    for nsub in subdivisions:
+        model = engine.Model.fromDict(data)
+        model.setSubdivision(nsub)
+        start = time.perf_counter()
+        model.assemble()
+        model.solve(engineName, nmodes)
+        seconds = time.perf_counter() - start
+        frequencies = model.getFrequencies()[:nmodes]
+        change = np.nan
+        if previous is not None:
+            n = min(frequencies.shape[0], previous.shape[0])
+            change = np.max(np.abs(frequencies[:n]/previous[:n] - 1))
+        rows.append({'nsub':nsub, 'ndof':model.eset.ndof, 'seconds':seconds, 'frequencies':frequencies, 'change':change})
+        previous = frequencies
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the convergence of the natural frequencies of a model with the subdivision")
+    parser.add_argument('model', help="model file (.json or .npz)")
+    parser.add_argument('--subdivisions', type=int, nargs='+', default=[1, 2, 4, 8], \
+        help="numbers of elements per element of the model (default: 1 2 4 8)")
+    parser.add_argument('--engine', choices=['dense', 'sparse', 'banded'], default='sparse', help="eigensolver (default: sparse)")
+    parser.add_argument('-k', '--nmodes', type=int, default=10, help="number of compared modes (default: 10)")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = subdivisionConvergence(modelfile.readModelFile(args.model), args.subdivisions, args.engine, args.nmodes)
+    except (OSError, ValueError) as err:
+        print(f"Convergence study failed: {err}")
+        return 1
+    print(f"{args.model}, lowest {args.nmodes} modes, {args.engine} engine")
+    print(f"{'nsub':>5} {'ndof':>7} {'time [s]':>9} {'max change':>11}  frequencies [Hz]")
+    for row in rows:
+        print(f"{row['nsub']:>5} {row['ndof']:>7} {row['seconds']:>9.4f} {row['change']:>11.2e}  " + \
+            ' '.join(f"{f:.4g}" for f in row['frequencies']))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Batch solution of many eigenHelper models in parallel.
+Reads a directory of model files (JSON or .npz, see modelfile.py for the format) or a manifest listing model files
+(one path per line, relative to the manifest), solves them across a process pool and writes
+the frequencies and mode shapes of each model to <output>/<model path>.npz, with the model path relative to
+the common directory of the model files, together with an overview in <output>/summary.json.
+
+Usage:
+    python eigenHelper/batch.py models/ -o results/ --workers 4 --blas-threads 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+import multiprocessing as mp
+from utils import *
+import engine
+
+BLAS_THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS', \
+    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+def findModelFiles(source):
+    """
+    Returns the model files in a directory, or listed in a manifest file
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, f) for f in os.listdir(source) if f.endswith(('.json', '.npz')))
+    root = os.path.dirname(os.path.abspath(source))
+    with open(source) as manifest:
+        lines = [line.strip() for line in manifest]
+    return [os.path.join(root, line) for line in lines if line and not line.startswith('#')]
+
+def outputNames(paths):
+    """
+    Returns unique output names of the model files: their paths relative to the common directory of all files,
+    without extension, numbered if they would still coincide (e.g. model.json and model.npz)
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    names = []
+    for path in paths:
+        base = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '/')
+        name, count = base, 1
+        while name in names:
+            count += 1
+            name = f"{base}-{count}"
+        names.append(name)
+    return names
+
+@contextmanager
+def blasThreadLimit(blasThreads):
+    """
+    Caps the number of BLAS threads of worker processes spawned within the context,
+    which load numpy with the thread cap from the environment
+    """
+    savedEnv = {var:os.environ.get(var) for var in BLAS_THREAD_VARIABLES}
+    for var in BLAS_THREAD_VARIABLES:
+        os.environ[var] = str(blasThreads)
+    try:
+        yield
+    finally:
+        for var, value in savedEnv.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+def solveModelFile(path, outdir, name, engineName='dense', nmodes=10, band=None):
+    """
+    Loads, assembles, checks and solves one model file, and stores its frequencies, eigenvectors and
+    unscaled mode shapes ux, uy (n_mesh_elements x 21 x nmodes) in <outdir>/<name>.npz.
+    Returns a summary of the solution; a failing model is reported in the summary rather than raised.
+    """
+    start = time.perf_counter()
+    try:
+        model = engine.loadModel(path)
+        model.assemble(renumber=(engineName == 'banded'))
+        ok, message = model.check()
+        if ok and model.solve(engineName, nmodes, band) is None:
+            ok, message = False, "No eigenmodes found in the specified frequency band"
+        if ok:
+            solution = model.solution
+            x0, y0, Nx, Ny = solution['operators']
+            ed = solution['a_extracted'][:,:,:nmodes]
+            frequencies = model.getFrequencies()
+            output = os.path.join(outdir, name + '.npz')
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            np.savez_compressed(output, frequencies=frequencies, \
+                eigenvectors=model.getModes(), x0=x0, y0=y0, ux=Nx @ ed, uy=Ny @ ed)
+    except Exception as err:
+        ok, message = False, f"{type(err).__name__}: {err}"
+    if not ok:
+        return {'model':name, 'path':path, 'ok':False, 'message':message, 'seconds':time.perf_counter() - start}
+    return {'model':name, 'path':path, 'ok':True, 'message':"Solved", 'nmodes':int(frequencies.shape[0]), \
+        'frequencies':frequencies[:nmodes].tolist(), 'seconds':time.perf_counter() - start}
+
+def solveBatch(paths, outdir, workers=None, blasThreads=1, engineName='dense', nmodes=10, band=None):
+    """
+    Solves the model files across a process pool with the given number of workers,
+    capping the number of BLAS threads in each worker. Returns the list of solution summaries.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    #worker processes are spawned, so they load numpy with the BLAS thread cap from the environment
+    with blasThreadLimit(blasThreads), ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = {pool.submit(solveModelFile, path, outdir, name, engineName, nmodes, band):(path, name) \
+            for path, name in zip(paths, outputNames(paths))}
+        summaries = []
+        for future in as_completed(futures):
+            try:
+                summaries.append(future.result())
+            except Exception as err:
+                #e.g. a worker process that died
+                path, name = futures[future]
+                summaries.append({'model':name, 'path':path, 'ok':False, 'message':f"{type(err).__name__}: {err}", 'seconds':0.0})
+    summaries.sort(key=lambda summary: summary['model'])
+    with open(os.path.join(outdir, 'summary.json'), 'w') as summaryFile:
+        json.dump(summaries, summaryFile, indent=2)
+    return summaries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve eigenHelper model files in parallel")
+    parser.add_argument('source', help="directory with model files (.json or .npz), or a manifest file listing them")
+    parser.add_argument('-o', '--output', default='results', help="output directory (default: results)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument('--blas-threads', type=int, default=1, help="BLAS threads per worker (default: 1)")
+    parser.add_argument('--engine', choices=['dense', 'sparse', 'banded'], default='dense', help="eigensolver (default: dense)")
+    parser.add_argument('-k', '--nmodes', type=int, default=10, \
+        help="number of modes computed by the sparse and banded engines and mode shapes stored (default: 10)")
+    parser.add_argument('--fmin', type=float, default=None, help="lower bound of the frequency band [Hz]")
+    parser.add_argument('--fmax', type=float, default=None, help="upper bound of the frequency band [Hz]")
+    args = parser.parse_args(argv)
+
+    band = None
+    if (args.fmin is not None) or (args.fmax is not None):
+        band = (args.fmin if args.fmin is not None else 0.0, args.fmax if args.fmax is not None else np.inf)
+    paths = findModelFiles(args.source)
+    start = time.perf_counter()
+    summaries = solveBatch(paths, args.output, args.workers, args.blas_threads, args.engine, args.nmodes, band)
+    for summary in summaries:
+        status = f"f1 = {summary['frequencies'][0]:.3f} Hz" if summary['ok'] else summary['message']
+        print(f"{summary['model']}: {status} ({summary['seconds']:.2f} s)")
+    nfailed = sum(not summary['ok'] for summary in summaries)
+    print(f"Solved {len(summaries) - nfailed}/{len(summaries)} models in {time.perf_counter() - start:.2f} s")
+    return 1 if nfailed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
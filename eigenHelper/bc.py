@@ -1,4 +1,3 @@
-from bokeh.models import Div, RadioButtonGroup, NumericInput, Button, Toggle
 from utils import *
 import solver
 import howto
@@ -49,16 +48,17 @@ class Support():
 
 
 class SupportSet(EntitySet):
+    """
+    Set of supports, indexed by the ID of the supported node (only one support is allowed per node)
+    """
+    def getKey(self, support):
+        return support.getNode().getID()
+
     def foundAtNode(self, nid):
-        for ind, support in enumerate(self.members):
-            if support.getNode().getID() == nid:
-                return True, ind
-        return False, np.NAN
+        return self.foundID(nid)
 
     def deleteAtNode(self, nid):
-        fnd, ind = self.foundAtNode(nid)
-        if fnd:
-            del self.members[ind]
+        self.deleteEntityWithID(nid)
 
     def getExEy(self, horizontal=False):
         w_base = 50 #width of the support marker in screen units
@@ -165,9 +165,8 @@ def addSupportOnClick(nModule, bcModule, solModule, htModule, ssetCDS, debugInfo
     if not nModule['nset'].foundID(bcModule['addToNodeWidget'].value)[0]:
         return
     # #check whether the support can be added
-    for support in bcModule['sset'].members:
-        if support.getNode().getID() == bcModule['addToNodeWidget'].value:
-            return
+    if bcModule['sset'].foundAtNode(bcModule['addToNodeWidget'].value)[0]:
+        return
     nSupport = createSupport(nModule['nset'], bcModule['rbg'].active, nModule['nset'].getEntityWithID(bcModule['addToNodeWidget'].value))
     if not nSupport:
         return
@@ -203,6 +202,7 @@ def toggleSupportInfo(attr, old, new, bcModule):
 Boundary Conditions module layout
 """
 def createBCLayout(debug=False):
+    from bokeh.models import Div, RadioButtonGroup, NumericInput, Button, Toggle
     sset = SupportSet()
     rbg = RadioButtonGroup(labels=['S1', 'S2', 'S3', 'S4', 'S5', 'S6'], active=0, disabled=True)
     addToNodeWidget = NumericInput(value=0, title="Add support at node:",mode='int', width=50,height=50, disabled=True)
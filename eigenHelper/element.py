@@ -1,18 +1,174 @@
-from bokeh.models import Div, NumericInput, Button, CheckboxGroup, Toggle
+import threading
+from collections import OrderedDict
+from functools import partial
 from utils import *
 import node
 import bc
 import solver
 import howto
 
+DENSE_NDOF_LIMIT = 300
+#maximum number of distinct elements whose matrices are kept in the element matrix cache
+ELEMENT_CACHE_SIZE = 4096
+#element mass formulations: consistent, or lumped (diagonal) with HRZ scaling of the consistent mass diagonal
+MASS_TYPES = {'Consistent':'consistent', 'Lumped (HRZ)':'lumped'}
+
+def edofEntries(edof):
+    """
+    Returns the 0-based global (rows, cols) of the entries of the stacked element matrices with the topology edof
+    (1-based dofs, n_elements x 6), in the order of the flattened element matrices
+    """
+    idx = np.asarray(edof, dtype=np.int64) - 1
+    return np.repeat(idx, idx.shape[1], axis=1).ravel(), np.tile(idx, (1, idx.shape[1])).ravel()
+
+def assembleGlobal(edof, elemMatrices, ndof, sparse=True):
+    """
+    Scatters stacked element matrices (n_elements x 6 x 6) into a global ndof x ndof matrix
+    according to the topology array edof (1-based dofs, n_elements x 6).
+    Duplicate entries are summed during the COO->CSR conversion.
+    """
+    rows, cols = edofEntries(edof)
+    A = sp.coo_matrix((np.asarray(elemMatrices).ravel(), (rows, cols)), shape=(ndof, ndof)).tocsr()
+    return A if sparse else A.toarray()
+
+def resizeGlobal(A, ndof):
+    """
+    Returns a copy of the global matrix A grown (padded with zeros) or shrunk to ndof x ndof, preserving the storage format
+    """
+    if sp.issparse(A):
+        A = A.tocoo()
+        keep = (A.row < ndof) & (A.col < ndof)
+        return sp.coo_matrix((A.data[keep], (A.row[keep], A.col[keep])), shape=(ndof, ndof)).tocsr()
+    resized = np.zeros((ndof, ndof))
+    n = min(ndof, A.shape[0])
+    resized[:n,:n] = A[:n,:n]
+    return resized
+
+#element matrix templates of beam2d in local coordinates, polynomial in the element length L
+_KAXIAL = np.zeros((6,6))
+_KAXIAL[np.ix_([0,3],[0,3])] = [[1,-1],[-1,1]]
+_KBEND = np.zeros((3,6,6))
+_KBEND[np.ix_([0],[1,2,4,5],[1,2,4,5])] = [[12,0,-12,0], [0,0,0,0], [-12,0,12,0], [0,0,0,0]]
+_KBEND[np.ix_([1],[1,2,4,5],[1,2,4,5])] = [[0,6,0,6], [6,0,-6,0], [0,-6,0,-6], [6,0,-6,0]]
+_KBEND[np.ix_([2],[1,2,4,5],[1,2,4,5])] = [[0,0,0,0], [0,4,0,2], [0,0,0,0], [0,2,0,4]]
+_MASS = np.zeros((3,6,6))
+_MASS[0] = [[140,0,0,70,0,0], [0,156,0,0,54,0], [0,0,0,0,0,0], [70,0,0,140,0,0], [0,54,0,0,156,0], [0,0,0,0,0,0]]
+_MASS[1] = [[0,0,0,0,0,0], [0,0,22,0,0,-13], [0,22,0,0,13,0], [0,0,0,0,0,0], [0,0,13,0,0,-22], [0,-13,0,0,-22,0]]
+_MASS[2] = [[0,0,0,0,0,0], [0,0,0,0,0,0], [0,0,4,0,0,-3], [0,0,0,0,0,0], [0,0,0,0,0,0], [0,0,-3,0,0,4]]
+
+def beam2dParts(ex, ey, massType='consistent'):
+    """
+    Returns the axial stiffness per unit EA, the bending stiffness per unit EI and the mass per unit rho*A
+    (consistent, or HRZ lumped with L^2/78 of the element mass at the rotations), each (n_elements x 6 x 6)
+    in global coordinates, of the elements with ex, ey (n_elements x 2).
+    """
+    return beam2dLocalParts(*beam2dGeometry(ex, ey), massType)
+
+def beam2dGeometry(ex, ey):
+    """
+    Returns the lengths L and the direction cosines c = cos(theta), s = sin(theta) of n_elements elements
+    with the end coordinates ex, ey (n_elements x 2)
+    """
+    ex, ey = np.asarray(ex, dtype=float).reshape(-1,2), np.asarray(ey, dtype=float).reshape(-1,2)
+    dx, dy = ex[:,1] - ex[:,0], ey[:,1] - ey[:,0]
+    L = np.hypot(dx, dy)
+    return L, dx/L, dy/L
+
+def beam2dLocalParts(L, c, s, massType='consistent'):
+    """
+    Returns the parts of the element matrices of beam2dParts for elements given by their lengths L and
+    direction cosines c, s (each with size n_elements), see beam2dGeometry
+    """
+    powers = np.stack((np.ones_like(L), L, L**2), axis=1)
+    localParts = [(1/L)[:,None,None]*_KAXIAL, (1/L**3)[:,None,None]*np.einsum('ep,pij->eij', powers, _KBEND)]
+    if massType == 'consistent':
+        localParts.append((L/420)[:,None,None]*np.einsum('ep,pij->eij', powers, _MASS))
+    G = np.zeros((L.size,6,6))
+    for k in (0,3):
+        G[:,k,k], G[:,k,k+1], G[:,k+1,k], G[:,k+1,k+1], G[:,k+2,k+2] = c, s, -s, c, 1.0
+    parts = [np.einsum('eji,ejk,ekl->eil', G, Al, G) for Al in localParts]
+    if massType == 'lumped':
+        Mu = np.zeros((L.size,6,6))
+        Mu[:,[0,1,3,4],[0,1,3,4]] = L[:,None]/2
+        Mu[:,[2,5],[2,5]] = (L**3/78)[:,None]
+        parts.append(Mu)
+    return parts
+
+def beam2dBatch(ex, ey, E, A, I, rho, massType='consistent'):
+    """
+    Vectorized cfc.beam2d: returns the stacked element stiffness and mass matrices (n_elements x 6 x 6)
+    of the elements with ex, ey (n_elements x 2) and properties E, A, I, rho (n_elements)
+    """
+    E, A, I, rho = [np.asarray(p, dtype=float).ravel()[:,None,None] for p in (E, A, I, rho)]
+    Ka, Kb, Mu = beam2dParts(ex, ey, massType)
+    return E*A*Ka + E*I*Kb, rho*A*Mu
+
+class ElementMatrixCache():
+    """
+    LRU cache of read-only element matrices, keyed on (L, cos, sin, E, A, I, rho) and the mass formulation,
+    so that identical elements share one pair of matrices
+    """
+    def __init__(self, maxsize=ELEMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def getInfo(self):
+        return {'hits':self.hits, 'misses':self.misses, 'size':len(self.entries), 'maxsize':self.maxsize}
+
+    def getMatrices(self, ex, ey, E, A, I, rho, massType='consistent'):
+        """
+        Cached counterpart of beam2dBatch, with the same arguments.
+        Returns lists of the shared, read-only element stiffness and mass matrices (each 6 x 6) of the n_elements elements.
+        """
+        L, c, s = beam2dGeometry(ex, ey)
+        props = [np.asarray(p, dtype=float).ravel() for p in (E, A, I, rho)]
+        unique, inverse = np.unique(np.column_stack((L, c, s, *props)), axis=0, return_inverse=True)
+        keys = [tuple(row) + (massType,) for row in unique.tolist()]
+        with self.lock:
+            missing = [k for k, key in enumerate(keys) if key not in self.entries]
+            if missing:
+                Ka, Kb, Mu = beam2dLocalParts(*unique[missing,:3].T, massType)
+                E, A, I, rho = [p[:,None,None] for p in unique[missing,3:7].T]
+                Ke, Me = E*A*Ka + E*I*Kb, rho*A*Mu
+                Ke.setflags(write=False)
+                Me.setflags(write=False)
+                for k, iKe, iMe in zip(missing, Ke, Me):
+                    self.entries[keys[k]] = (iKe, iMe)
+            matrices = []
+            for key in keys:
+                self.entries.move_to_end(key)
+                matrices.append(self.entries[key])
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            self.misses += len(missing)
+            self.hits += L.size - len(missing)
+        inverse = inverse.ravel()
+        return [matrices[k][0] for k in inverse], [matrices[k][1] for k in inverse]
+
+ELEMENT_CACHE = ElementMatrixCache()
+
 class Element():
-    def __init__(self, id, nodeA, nodeB, prop):
+    def __init__(self, id, nodeA, nodeB, prop, releases=(False, False)):
         self.id = id
         self.na = nodeA
         self.nb = nodeB
         self.edof = np.concatenate((self.na.getDOFs(),self.nb.getDOFs()))
         self.properties = prop
-        self.Ke, self.Me = self.computeMatrices()
+        self.releases = (bool(releases[0]), bool(releases[1]))
+        self.massType = 'consistent'
+        self.Ke, self.Me = None, None
+        #number of elements the element is subdivided into (None: the default of the element set), and the generated sub-elements
+        self.nsub = None
+        self.mesh = []
 
     def getExEy(self):
         ex = np.array([self.na.getX(), self.nb.getX()])
@@ -20,7 +176,10 @@ class Element():
         return ex, ey
 
     def getNodes(self):
-        return [self.na.getName(), self.nb.getName()]
+        return [n.getName() + ('-H' if released else '') for n, released in zip((self.na, self.nb), self.releases)]
+
+    def getReleases(self):
+        return self.releases
 
     def getProp(self):
         return self.properties
@@ -28,21 +187,97 @@ class Element():
     def getEdof(self):
         return self.edof
 
+    def getMesh(self):
+        """
+        Returns the elements the element is subdivided into, or the element itself if it is not subdivided
+        """
+        return self.mesh or [self]
+
     def getID(self):
         return self.id
 
     def getElementStiffnessMatrix(self):
+        if self.Ke is None:
+            self.Ke, self.Me = self.computeMatrices()
         return self.Ke
 
     def getElementMassMatrix(self):
+        if self.Me is None:
+            self.Ke, self.Me = self.computeMatrices()
         return self.Me
 
+    def setProp(self, prop):
+        self.properties = prop
+        self.Ke, self.Me = None, None
+        for sub in self.mesh:
+            sub.setProp(prop)
+
+    def setMassType(self, massType):
+        self.massType = massType
+        self.Me = None
+        for sub in self.mesh:
+            sub.setMassType(massType)
+
+    def subdivide(self, nsub, firstDof):
+        """
+        Returns nsub sub-elements of the element, with its properties and mass formulation,
+        connected by nsub-1 equally spaced internal nodes with the dofs firstDof, firstDof+1, ...
+        The hinges at the ends of the element are kept at the outer ends of the first and last sub-element.
+        """
+        (xa, xb), (ya, yb) = self.getExEy()
+        nodes = [self.na]
+        for i in range(1, nsub):
+            internal = node.Node(xa + i*(xb - xa)/nsub, ya + i*(yb - ya)/nsub, None)
+            internal.setDOFs(np.arange(firstDof + 3*(i-1), firstDof + 3*i, dtype=np.int32))
+            nodes.append(internal)
+        nodes.append(self.nb)
+        mesh = []
+        for i in range(nsub):
+            sub = Element(self.id, nodes[i], nodes[i+1], self.properties, (self.releases[0] and i == 0, self.releases[1] and i == nsub-1))
+            sub.setMassType(self.massType)
+            mesh.append(sub)
+        return mesh
+
+    def getMeshEnds(self):
+        """
+        Returns the dofs of the outer ends of the mesh of the element, the dofs of its nodes, and the flags of the released
+        rotations among them (each of size 6)
+        """
+        mesh = self.getMesh()
+        ends = np.concatenate((mesh[0].getEdof()[:3], mesh[-1].getEdof()[3:]))
+        nodal = np.concatenate((self.na.getDOFs(), self.nb.getDOFs()))
+        return ends, nodal, np.array([False, False, self.releases[0], False, False, self.releases[1]])
+
+    def followsNodes(self):
+        """
+        Returns True if the mesh of the element ends at the current dofs of its nodes, apart from the released rotations
+        """
+        ends, nodal, released = self.getMeshEnds()
+        return np.array_equal(ends[~released], nodal[~released])
+
+    def meshMatches(self, nsub):
+        """
+        Returns True if the mesh of the element has nsub elements, follows the nodes and has its own dofs
+        at the released ends, i.e. it needs not be generated again, see ElementSet.subdivide
+        """
+        ends, nodal, released = self.getMeshEnds()
+        return len(self.getMesh()) == nsub and self.followsNodes() and not np.isin(ends[released], nodal).any()
+
+    def releaseDofs(self, firstDof):
+        """
+        Gives the released end rotations of the element its own dofs firstDof, firstDof+1, ... in place of the node rotations,
+        so that the element end rotates independently of the node. Returns the number of released ends.
+        """
+        released = [k for k, flag in zip((2, 5), self.releases) if flag]
+        self.edof[released] = np.arange(firstDof, firstDof + len(released))
+        return len(released)
+
     def computeMatrices(self):
+        #same cache as the batched assembly, so that the matrices of single elements can be scattered in and out exactly
         ex, ey = self.getExEy()
         props = self.getProp()
-        ep = [props['E'], props['A'], props['I'], props['rho']*props['A']]
-        Ke, Me = cfc.beam2d(ex, ey, ep)
-        return Ke, Me
+        Ke, Me = ELEMENT_CACHE.getMatrices(ex, ey, props['E'], props['A'], props['I'], props['rho'], self.massType)
+        return Ke[0], Me[0]
 
     def printInfo(self, debug=False):
         if debug:
@@ -58,20 +293,121 @@ class Element():
 
 
 class ElementSet(EntitySet):
+    """
+    Set of elements. Once assembled, the global matrices K and M are kept live: adding, removing or editing an element
+    scatters only its element matrices. The matrices are replaced rather than modified, so snapshots stay consistent.
+    The computations run on the mesh, in which subdivided elements are replaced by their sub-elements (see subdivide).
+    If the dofs were renumbered, dofOrder[d-1] is the dof number before renumbering of dof d.
+    """
     def __init__(self):
         EntitySet.__init__(self)
         self.K = []
         self.M = []
         self.ndof = 0
         self.edof = []
-        self.ddofs = np.array([], dtype=np.int32)
-        self.potentialddofs = []
+        self.nodePairs = set()
+        self.assembled = False
+        self.massType = 'consistent'
+        self.nsub = 1
+        self.dofOrder = np.array([], dtype=np.int32)
+
+    def add(self, newElement):
+        newElement.setMassType(self.massType)
+        EntitySet.add(self, newElement)
+        self.nodePairs.add(frozenset((newElement.na, newElement.nb)))
+        self.countHinges(newElement, 1)
+        if self.assembled:
+            newElement.releaseDofs(self.ndof + 1)
+            self.scatterElement(newElement, 1)
+
+    def deleteEntityWithID(self, elemID):
+        elem = self.getEntityWithID(elemID)
+        if elem:
+            self.nodePairs.discard(frozenset((elem.na, elem.nb)))
+            self.countHinges(elem, -1)
+            if self.assembled:
+                self.scatterElement(elem, -1)
+        EntitySet.deleteEntityWithID(self, elemID)
+        self.setNdof()
+
+    def updateElementProperties(self, elemID, prop):
+        """
+        Changes the properties (dict with E, A, I, rho) of the element with ID elemID
+        and updates the assembled global matrices
+        """
+        elem = self.getEntityWithID(elemID)
+        if not elem:
+            return False
+        if self.assembled:
+            self.scatterElement(elem, -1)
+        elem.setProp(prop)
+        if self.assembled:
+            self.scatterElement(elem, 1)
+        return elem
+
+    def setMassType(self, massType):
+        """
+        Sets the mass formulation ('consistent' or 'lumped', see MASS_TYPES) of all elements
+        and reassembles the global mass matrix if the set is assembled
+        """
+        if massType not in MASS_TYPES.values():
+            raise ValueError(f"Mass type must be one of {', '.join(MASS_TYPES.values())}")
+        if massType == self.massType:
+            return
+        self.massType = massType
+        for elem in self.members:
+            elem.setMassType(massType)
+        if self.assembled:
+            _, Me = self.computeElementMatrices()
+            for elem, iMe in zip(self.getMesh(), Me):
+                elem.Me = iMe
+            self.M = assembleGlobal(self.getModelEdof(), Me, self.ndof, sp.issparse(self.K))
+
+    def scatterElement(self, elem, sign):
+        """
+        Adds (sign=1) or subtracts (sign=-1) the element matrices of elem (of all its sub-elements, if it is subdivided)
+        to/from the assembled global matrices
+        """
+        self.scatterMesh(elem.getMesh(), sign)
+
+    def scatterMesh(self, mesh, sign):
+        """
+        Adds (sign=1) or subtracts (sign=-1) the element matrices of the mesh elements to/from the assembled global matrices
+        """
+        edof = np.array([sub.getEdof() for sub in mesh]).reshape(-1,6)
+        ndof = max(self.ndof, int(edof.max(initial=0)))
+        if ndof != self.K.shape[0]:
+            self.K, self.M = resizeGlobal(self.K, ndof), resizeGlobal(self.M, ndof)
+        sparse = sp.issparse(self.K)
+        self.K = self.K + assembleGlobal(edof, sign*np.array([sub.getElementStiffnessMatrix() for sub in mesh]), ndof, sparse)
+        self.M = self.M + assembleGlobal(edof, sign*np.array([sub.getElementMassMatrix() for sub in mesh]), ndof, sparse)
+
+    def countHinges(self, elem, sign):
+        for n, released in zip((elem.na, elem.nb), elem.getReleases()):
+            n.hinges += sign*released
+
+    def getReleases(self):
+        """
+        Returns the end release flags of all elements (n_elements x 2, ends A and B)
+        """
+        return np.array([elem.getReleases() for elem in self.members], dtype=bool).reshape(-1,2)
+
+    def getUnconnectedDofs(self):
+        """
+        Returns the (1-based) dofs up to ndof which no element of the mesh refers to, e.g. node rotations with hinges
+        at every connected element end. They carry no stiffness or mass and are treated as constrained in the solution.
+        """
+        return np.setdiff1d(np.arange(1, self.ndof+1), self.getModelEdof())
+
+    def matchesSnapshot(self, view):
+        """
+        Returns True if no elements were added or removed and the global matrices were not replaced since the snapshot view
+        was taken, e.g. by an element edit or a reassembly with another mass formulation, subdivision or dof numbering
+        """
+        return EntitySet.matchesSnapshot(self, view) and (self.K is view.K) and (self.M is view.M)
 
     def foundNodes(self,n1,n2):
-        for elem in self.members:
-            if ((elem.na is n1) and (elem.nb is n2)) or ((elem.na is n2) and (elem.nb is n1)):
-                return True
-        return False
+        return frozenset((n1, n2)) in self.nodePairs
 
     def getExEy(self):
         ex = []
@@ -82,6 +418,13 @@ class ElementSet(EntitySet):
             ey.append(iey)
         return ex, ey
 
+    def getMeshExEy(self):
+        """
+        Returns the end coordinates ex, ey (n_mesh_elements x 2) of all elements of the mesh, see getMesh
+        """
+        mesh = self.getMesh()
+        return np.array([elem.getExEy()[0] for elem in mesh]).reshape(-1,2), np.array([elem.getExEy()[1] for elem in mesh]).reshape(-1,2)
+
     def getIDs(self):
         ids = []
         for elem in self.members:
@@ -110,6 +453,15 @@ class ElementSet(EntitySet):
             rho.append(iprop['rho'])
         return E, A, I, rho
 
+    def computeElementMatrices(self):
+        """
+        Returns the element stiffness and mass matrices of all elements of the mesh, as lists of the read-only matrices
+        shared by identical elements through the element matrix cache (see ElementMatrixCache)
+        """
+        ex, ey = self.getMeshExEy()
+        E, A, I, rho = np.array([[elem.getProp()[p] for p in ('E', 'A', 'I', 'rho')] for elem in self.getMesh()]).reshape(-1,4).T
+        return ELEMENT_CACHE.getMatrices(ex, ey, E, A, I, rho, self.massType)
+
     def getStiffnessMatrix(self):
         return self.K
 
@@ -117,47 +469,188 @@ class ElementSet(EntitySet):
         return self.M
 
     def getModelEdof(self):
-        edof = np.zeros((self.getSize(),6), dtype=np.int32)
-        for nel, element in enumerate(self.members):
+        """
+        Returns the topology (1-based dofs, n_mesh_elements x 6) of all elements of the mesh, see getMesh
+        """
+        mesh = self.getMesh()
+        edof = np.zeros((len(mesh),6), dtype=np.int32)
+        for nel, element in enumerate(mesh):
             edof[nel,:] = element.getEdof()
         self.edof = edof
         return self.edof
 
+    def getMesh(self):
+        """
+        Returns the elements of the mesh, i.e. the sub-elements of the subdivided elements and the other elements, in the order of the set
+        """
+        return [sub for elem in self.members for sub in elem.getMesh()]
+
+    def getMeshMembers(self):
+        """
+        Returns the (0-based) index of the element of the set each element of the mesh belongs to
+        """
+        return np.repeat(np.arange(self.getSize()), [len(elem.getMesh()) for elem in self.members])
+
+    def setSubdivision(self, nsub, elemIDs=None):
+        """
+        Sets the number of elements nsub into which the elements with the IDs elemIDs, or by default all elements
+        without an own setting, are subdivided at the next assembly (see subdivide).
+        nsub=None removes the own setting of the elements elemIDs.
+        """
+        if (nsub is not None) and int(nsub) < 1:
+            raise ValueError("Elements must be subdivided into at least 1 element")
+        nsub = None if nsub is None else int(nsub)
+        if elemIDs is None:
+            self.nsub = 1 if nsub is None else nsub
+            return
+        for elemID in elemIDs:
+            elem = self.getEntityWithID(elemID)
+            if not elem:
+                raise ValueError(f"Element {elemID} does not exist")
+            elem.nsub = nsub
+
+    def getSubdivision(self, elem):
+        return elem.nsub or self.nsub
+
+    def getInternalDofs(self):
+        """
+        Returns the (1-based) dofs of the mesh which belong to no node of the node set,
+        i.e. the dofs of the internal nodes and the released end rotations
+        """
+        nodal = [dof for elem in self.members for n in (elem.na, elem.nb) for dof in n.getDOFs()]
+        return np.setdiff1d(self.getModelEdof(), nodal).astype(np.int32)
+
+    def subdivide(self, nset):
+        """
+        Generates the mesh of the set: elements with nsub > 1 (see setSubdivision) get nsub sub-elements with internal nodes,
+        which are not added to the sets, and hinged element ends get their own rotation dofs (see Element.releaseDofs).
+        Only the elements whose mesh changed are meshed again. In an assembled set, their dofs are numbered after the current
+        ones and their matrices are scattered out and in again, the dofs they no longer use staying unconnected.
+        Otherwise, or if the nodes were renumbered or too many dofs are unconnected, all internal and released dofs are numbered
+        after the dofs of the node set, and the global matrices have to be assembled again.
+        """
+        ndof = max(self.ndof, nset.getMaxDOF())
+        nsubs = [self.getSubdivision(elem) for elem in self.members]
+        changed = [(elem, nsub) for elem, nsub in zip(self.members, nsubs) if not elem.meshMatches(nsub)]
+        if not changed:
+            return
+        if self.assembled and all(elem.followsNodes() for elem, _ in changed) and \
+            self.getUnconnectedDofs().size <= self.ndof//2:
+            old = [sub for elem, _ in changed for sub in elem.getMesh()]
+            self.scatterMesh(old, -1)
+            nextDof = ndof + 1
+            for elem, nsub in changed:
+                nextDof = self.meshElement(elem, nsub, nextDof)
+            self.scatterMesh([sub for elem, _ in changed for sub in elem.getMesh()], 1)
+            self.setNdof()
+            return
+        nodal = np.unique(np.array([dof for n in nset.members for dof in n.getDOFs()], dtype=np.int32))
+        self.K, self.M = [], []
+        self.assembled = False
+        if ndof > nodal.size:
+            internal = np.setdiff1d(np.arange(1, ndof+1), nodal)
+            newDofs = np.zeros(ndof, dtype=np.int32)
+            newDofs[nodal-1] = np.arange(1, nodal.size+1)
+            newDofs[internal-1] = np.arange(nodal.size+1, ndof+1)
+            for n in nset.members:
+                n.setDOFs(newDofs[np.asarray(n.getDOFs()) - 1])
+            self.renumberDOFs(newDofs)
+            ndof = nodal.size
+            self.dofOrder = self.dofOrder[:ndof]
+        nextDof = ndof + 1
+        for elem, nsub in zip(self.members, nsubs):
+            nextDof = self.meshElement(elem, nsub, nextDof)
+        self.setNdof()
+
+    def meshElement(self, elem, nsub, firstDof):
+        """
+        Generates the mesh of elem with nsub elements from the dofs of its nodes, numbering its internal and released dofs
+        from firstDof on. Returns the next free dof.
+        """
+        elem.edof = np.concatenate((elem.na.getDOFs(), elem.nb.getDOFs()))
+        elem.mesh = elem.subdivide(nsub, firstDof) if nsub > 1 else []
+        nextDof = firstDof + 3*(nsub - 1)
+        for sub in elem.getMesh():
+            nextDof += sub.releaseDofs(nextDof)
+        return nextDof
+
     def setNdof(self):
-        curmax = np.NINF
-        for elem in self.members:
-            maxdof = np.max(elem.getEdof())
-            if maxdof > curmax:
-                curmax = maxdof
-        self.ndof = curmax
-
-    def assemble(self):
-        self.K = np.zeros((self.ndof, self.ndof))
-        self.M = np.zeros((self.ndof, self.ndof))
-        for elem in self.members:
-            cfc.assem(elem.getEdof(), self.getStiffnessMatrix(), elem.getElementStiffnessMatrix())
-            cfc.assem(elem.getEdof(), self.getMassMatrix(), elem.getElementMassMatrix())
+        self.ndof = max((int(np.max(elem.getEdof())) for elem in self.getMesh()), default=0)
+        if self.assembled and self.K.shape[0] != self.ndof:
+            self.K, self.M = resizeGlobal(self.K, self.ndof), resizeGlobal(self.M, self.ndof)
+
+    def assemble(self, sparse=None):
+        """
+        Assembles the global stiffness and mass matrices in one vectorized COO->CSR pass
+        from the stacked element matrices and the model edof table.
+        If sparse is None, sparse storage is chosen for models with more than DENSE_NDOF_LIMIT dofs,
+        otherwise dense ndarrays are returned when sparse is False.
+        """
+        self.setGlobalMatrices(*self.computeGlobalMatrices(sparse))
+
+    def setGlobalMatrices(self, K, M):
+        """
+        Stores the assembled global matrices, which are kept live from now on
+        """
+        self.K, self.M = K, M
+        self.assembled = True
+
+    def computeGlobalMatrices(self, sparse=None):
+        """
+        Returns the assembled global stiffness and mass matrices (K, M) without storing them, see assemble.
+        If the live matrices are already in the requested format, they are returned without reassembly.
+        """
+        if sparse is None:
+            sparse = self.ndof > DENSE_NDOF_LIMIT
+        if self.assembled and sp.issparse(self.K) == sparse:
+            return self.K, self.M
+        Ke, Me = self.computeElementMatrices()
+        for elem, iKe, iMe in zip(self.getMesh(), Ke, Me):
+            elem.Ke, elem.Me = iKe, iMe
+        edof = self.getModelEdof()
+        return assembleGlobal(edof, Ke, self.ndof, sparse), assembleGlobal(edof, Me, self.ndof, sparse)
 
     def clear(self):
+        for elem in self.members:
+            self.countHinges(elem, -1)
         EntitySet.clear(self)
         self.K = []
         self.M = []
         self.ndof = 0
         self.edof = []
-        self.ddofs = np.array([], dtype=np.int32)
-        self.potentialddofs = []
-
-    def checkDanglingDOFs(self, potentialDofs):
-        edofs = self.getModelEdof()
-        for potentialDanglingDof in potentialDofs:
-            if potentialDanglingDof not in edofs:
-                self.addDanglingDOF(potentialDanglingDof)
-
-    def addDanglingDOF(self, dof):
-        self.ddofs = np.unique(np.append(self.ddofs,dof))
-
-
-def createElement(elset, nset, id, na, nb, elprop):
+        self.nodePairs = set()
+        self.assembled = False
+        self.dofOrder = np.array([], dtype=np.int32)
+
+    def renumberDOFs(self, newDofs):
+        """
+        Applies the dof renumbering newDofs (newDofs[d-1] is the new number of dof d, see node.NodeSet.renumberDOFs)
+        to the element topologies and the assembled global matrices
+        """
+        for elem in self.members:
+            elem.edof = newDofs[elem.getEdof() - 1]
+            for sub in elem.mesh:
+                sub.edof = newDofs[sub.getEdof() - 1]
+            for sub in elem.mesh[:-1]:
+                sub.nb.setDOFs(newDofs[sub.nb.getDOFs() - 1])
+        order = np.argsort(newDofs)
+        self.dofOrder = self.getOriginalDofs(newDofs.size)[order]
+        if self.assembled:
+            ndof = min(self.K.shape[0], newDofs.size)
+            #previous dofs in the new order, the rows of dofs beyond the matrices (not connected to elements) stay empty
+            kept = order[order < ndof]
+            self.K = resizeGlobal(extractBlock(self.K, kept, kept), newDofs.size)
+            self.M = resizeGlobal(extractBlock(self.M, kept, kept), newDofs.size)
+        self.setNdof()
+
+    def getOriginalDofs(self, ndof):
+        """
+        Returns the dof numbers before any renumbering of the dofs 1..ndof
+        """
+        return np.concatenate((self.dofOrder[:ndof], np.arange(self.dofOrder.size + 1, ndof + 1, dtype=np.int32)))
+
+
+def createElement(elset, nset, id, na, nb, elprop, releases=(False, False)):
     fndA, _ = nset.foundID(na.getID())
     fndB, _ = nset.foundID(nb.getID())
     if not (fndA and fndB):
@@ -165,10 +658,40 @@ def createElement(elset, nset, id, na, nb, elprop):
     fndNds = elset.foundNodes(na,nb)
     fndID, _ = elset.foundID(id)
     if not (fndNds or fndID) and not (na is nb):
-        newElement = Element(id,na,nb,elprop)
+        newElement = Element(id,na,nb,elprop,releases)
         return newElement
     return False
 
+def addElement(nset, elset, id, na, nb, elprop, hingeA=False, hingeB=False):
+    """
+    Creates an element between nodes na and nb and adds it to the element set.
+    A hinge at an element end releases the end rotation, which gets its own dof at assembly.
+    Returns the new element, or False if it could not be created.
+    """
+    nElement = createElement(elset, nset, id, na, nb, elprop, (hingeA, hingeB))
+    if not nElement:
+        return False
+    elset.add(nElement)
+    elset.setNdof()
+    return nElement
+
+def prepareAssembly(nset, elset, renumber=False):
+    """
+    Prepares the sets for assembly: generates the mesh of the subdivided elements (see ElementSet.subdivide),
+    and if renumber is True, renumbers the dofs to minimize the bandwidth of the global matrices, see node.NodeSet.renumberDOFs.
+    """
+    elset.subdivide(nset)
+    if renumber and elset.members:
+        ndof = max(elset.ndof, nset.getMaxDOF())
+        elset.renumberDOFs(nset.renumberDOFs(elset.getModelEdof(), ndof))
+
+def assembleModel(nset, elset, sparse=None, renumber=False):
+    """
+    Subdivides the elements, optionally renumbers the dofs, and assembles the global stiffness and mass matrices.
+    """
+    prepareAssembly(nset, elset, renumber)
+    elset.assemble(sparse)
+
 def updateElementData(elemset, elemCDS):
     ex, ey = elemset.getExEy()
     ids = elemset.getIDs()
@@ -221,34 +744,16 @@ def addElemOnClick(nModule, elModule, solModule, nodeCDS, elemCDS, debugInfo):
     elprop = {'E':elModule['eYoungWidget'].value, 'rho':elModule['eDensityWidget'].value, 'A':elModule['eAreaWidget'].value, 'I':elModule['eInertiaWidget'].value}
     if not (na and nb):
         return
-    #create the element - first check for possible hinges
-    if not (elModule['hinaWidget'].active or elModule['hinbWidget'].active):
-        nElement = createElement(elModule['eset'], nModule['nset'], elModule['eIDWidget'].value, na, nb, elprop)
-    else: #find which node(s) should be a hinge
-        #duplicate them and add rotational dof
-        if (elModule['hinaWidget'].active):
-            hingeNode, dDof = na.duplicateAsHinge(nModule['nset'].getNextID(), nModule['nset'].getNextDOF())
-            nModule['nset'].add(hingeNode)
-            nModule['nIDWidget'].value = nModule['nset'].getNextID()
-            elModule['eset'].potentialddofs.append(dDof)
-            na = hingeNode
-        if (elModule['hinbWidget'].active):
-            hingeNode, dDof = nb.duplicateAsHinge(nModule['nset'].getNextID(), nModule['nset'].getNextDOF())
-            nModule['nset'].add(hingeNode)
-            nModule['nIDWidget'].value = nModule['nset'].getNextID()
-            elModule['eset'].potentialddofs.append(dDof)
-            nb = hingeNode
-        #create element with new rotational dof
-        nElement = createElement(elModule['eset'], nModule['nset'], elModule['eIDWidget'].value, na, nb, elprop)
-        #TODO: plot hinge symbol
+    #create the element - hinges release the element end rotations
+    hingeA, hingeB = bool(elModule['hinaWidget'].active), bool(elModule['hinbWidget'].active)
+    nElement = addElement(nModule['nset'], elModule['eset'], elModule['eIDWidget'].value, na, nb, elprop, hingeA, hingeB)
+    if not nElement:
+        return
+    if hingeA or hingeB:
+        #nodes with hinged element ends are plotted with a hinge symbol
         node.updateCoordData(nModule['nset'], nodeCDS)
-        node.updateNodeText(nModule['divNodes'], nModule['nset'], False, debugInfo)
         elModule['hinaWidget'].active = []
         elModule['hinbWidget'].active = []
-    if not nElement:
-        return
-    elModule['eset'].add(nElement)
-    elModule['eset'].setNdof()
     elModule['eIDWidget'].value = elModule['eset'].getNextID()
     updateElementData(elModule['eset'],elemCDS)
     updateElementText(elModule['divElements'], elModule['eset'], False, debugInfo)
@@ -258,16 +763,11 @@ def addElemOnClick(nModule, elModule, solModule, nodeCDS, elemCDS, debugInfo):
 def delElemOnClick(nModule, elModule, bcModule, solModule, htModule, nodeCDS, elemCDS, modeCDS, debugInfo):
     if (not elModule['eset'].members) or (not elModule['eset'].foundID(elModule['delElNumWidget'].value)[0]):
         return
-    #remove duplicated hinge nodes at element removal
-    elToDelete = elModule['eset'].getEntityWithID(elModule['delElNumWidget'].value)
-    nodes = [elToDelete.na, elToDelete.nb]
-    for n in nodes:
-        if n.hinge:
-            nModule['nset'].deleteEntityWithID(n.getID())
-            node.updateCoordData(nModule['nset'], nodeCDS)
-            node.updateNodeText(nModule['divNodes'], nModule['nset'], False, debugInfo)
-    #remove the element
+    #remove the element, and the hinge symbols of its hinged ends
+    hinged = any(elModule['eset'].getEntityWithID(elModule['delElNumWidget'].value).getReleases())
     elModule['eset'].deleteEntityWithID(elModule['delElNumWidget'].value)
+    if hinged:
+        node.updateCoordData(nModule['nset'], nodeCDS)
     elModule['delElNumWidget'].value = 0
     elModule['eIDWidget'].value = elModule['eset'].getNextID()
     updateElementData(elModule['eset'], elemCDS)
@@ -282,26 +782,48 @@ def delAllElemOnClick(nModule, elModule, bcModule, solModule, htModule, nodeCDS,
     bc.clearBCModule(bcModule, htModule, ssetCDS, debugInfo)
     bc.deactivateBCModule(bcModule, htModule)
     clearElementModule(elModule, htModule, elemCDS, debugInfo)
-    nModule['nset'].removeHinges()
     node.updateCoordData(nModule['nset'], nodeCDS)
     node.updateNodeText(nModule['divNodes'], nModule['nset'], False, debugInfo)
     solver.checkModelOnClick(nModule, elModule, bcModule, solModule, htModule, modeCDS)
     node.activateNodeModule(nModule, debugInfo)
 
-def assembleOnClick(nModule, elModule, bcModule, solModule, htModule, nodeCDS, debugInfo):
+def assembleOnClick(nModule, elModule, bcModule, solModule, htModule, nodeCDS, modeCDS, debugInfo):
     if elModule['eset'].members:
-        #check for dangling nodes, delete them and flag dangling rotational dofs
-        elModule['eset'].checkDanglingDOFs(elModule['eset'].potentialddofs)
-        nModule['nset'].cleanUpAfterHinges(elModule['eset'].ddofs)
+        #a running check or solution and the shown modes belong to the previous global matrices
+        solver.cancelTask(solModule, 'check')
+        solver.cancelTask(solModule, 'solve')
+        solver.hideSolution(solModule, modeCDS)
+        elModule['eset'].setMassType(MASS_TYPES[elModule['massSelect'].value])
+        elModule['eset'].setSubdivision(max(int(elModule['subdivisionWidget'].value or 1), 1))
+        #subdivide the elements and optionally renumber the dofs
+        prepareAssembly(nModule['nset'], elModule['eset'], bool(elModule['renumberWidget'].active))
         node.updateCoordData(nModule['nset'], nodeCDS)
-        node.updateNodeText(nModule['divNodes'], nModule['nset'], True, debugInfo)
-        #assemble stiffness and mass matrices
-        elModule['eset'].assemble()
-        updateElementText(elModule['divElements'], elModule['eset'], True, debugInfo)
-        htModule['colors'][2] = 'green'
-        howto.updateHowtoDiv(htModule)
-        bc.activateBCModule(bcModule)
-        elModule['assembleButton'].disabled = True
+        #assemble stiffness and mass matrices in the background
+        view = elModule['eset'].snapshot()
+        solver.submitTask(solModule, 'assemble', view.computeGlobalMatrices, \
+            partial(finishAssembly, view=view, nModule=nModule, elModule=elModule, bcModule=bcModule, htModule=htModule, \
+                solModule=solModule, debugInfo=debugInfo), "Assembling global matrices\u2026")
+
+def finishAssembly(matrices, view, nModule, elModule, bcModule, htModule, solModule, debugInfo):
+    if not elModule['eset'].matchesSnapshot(view):
+        solver.printMessage("Elements changed during assembly. Click Go to Define Supports again", "red", solModule['divSolver'])
+        return
+    elModule['eset'].setGlobalMatrices(*matrices)
+    solModule['divSolver'].text = ""
+    nmesh = len(elModule['eset'].getMesh())
+    if nmesh > elModule['eset'].getSize():
+        solver.printMessage(f"Elements subdivided into {nmesh} elements with {elModule['eset'].ndof} DOFs", "green", solModule['divSolver'])
+    node.updateNodeText(nModule['divNodes'], nModule['nset'], True, debugInfo)
+    updateElementText(elModule['divElements'], elModule['eset'], True, debugInfo)
+    htModule['colors'][2] = 'green'
+    howto.updateHowtoDiv(htModule)
+    bc.activateBCModule(bcModule)
+    elModule['assembleButton'].disabled = True
+
+def changeAssemblyOptions(attr, old, new, elModule, solModule):
+    #the new mass formulation, subdivision and dof numbering are applied at the next assembly
+    if elModule['eset'].members:
+        elModule['assembleButton'].disabled = False
         solModule['solveButton'].disabled = True
 
 def toggleElementLabels(attr, old, new, labels):
@@ -314,6 +836,7 @@ def toggleElementInfo(attr, old, new, elModule):
 Element module layout
 """
 def createElementLayout(debug=False):
+    from bokeh.models import Div, NumericInput, Button, CheckboxGroup, Toggle, Select
     eset = ElementSet()
     eIDWidget = NumericInput(value=1, title="Element ID:",mode='int', width=50,height=50, disabled=True)
     enaWidget = NumericInput(value=1, title="Node A:",mode='int', width=50,height=50, disabled=True)
@@ -324,6 +847,9 @@ def createElementLayout(debug=False):
     eDensityWidget = NumericInput(value=2500, title="\u03C1 [kg/m\u00b3]:",mode='float', width=100,height=50, disabled=True)
     eAreaWidget = NumericInput(value=0.1030e-2, title="A [m\u00b2]:",mode='float', width=100,height=50, disabled=True)
     eInertiaWidget = NumericInput(value=0.0171e-4, title="I [m\u2074]:",mode='float', width=100,height=50, disabled=True)
+    massSelect = Select(title="Mass matrix:", options=list(MASS_TYPES.keys()), value='Consistent', width=100, disabled=True)
+    renumberWidget = CheckboxGroup(labels=['Renumber DOFs'], active=[], width=120, disabled=True)
+    subdivisionWidget = NumericInput(value=1, low=1, title="Subdivide into:", mode='int', width=100, disabled=True)
     delElNumWidget = NumericInput(value=0, title="Element to be deleted:",mode='int', width=50, disabled=True)
     addElemButton = Button(label="Add Element", button_type="primary", width=100, disabled=True )
     delElemButton = Button(label="Remove Element", button_type="warning", width=120, disabled=True )
@@ -338,7 +864,8 @@ def createElementLayout(debug=False):
     elemLayoutDict = {'eset':eset, 'eIDWidget':eIDWidget, 'enaWidget':enaWidget, 'enbWidget':enbWidget, \
         'hinaWidget':hinaWidget, 'hinbWidget':hinbWidget, \
         'eYoungWidget':eYoungWidget, 'eDensityWidget':eDensityWidget, 'eAreaWidget':eAreaWidget, 'eInertiaWidget':eInertiaWidget, \
-        'delElNumWidget':delElNumWidget, 'addElemButton':addElemButton, 'delElemButton':delElemButton, \
+        'massSelect':massSelect, 'renumberWidget':renumberWidget, \
+        'subdivisionWidget':subdivisionWidget, 'delElNumWidget':delElNumWidget, 'addElemButton':addElemButton, 'delElemButton':delElemButton, \
         'delAllElemButton':delAllElemButton, 'assembleButton': assembleButton, 'divElements':divElements, \
         'elemLabelsToggle':elemLabelsToggle, 'showElemInfoToggle':showElemInfoToggle, 'divLine':divLine}
     return elemLayoutDict
\ No newline at end of file
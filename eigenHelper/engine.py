@@ -0,0 +1,199 @@
+"""
+Headless eigenHelper engine.
+Builds a model, assembles, checks and solves the eigenvalue problem, and reconstructs mode shapes
+using the same classes and functions as the app, without importing bokeh.
+
+Example:
+    model = Model()
+    model.addNode(0, 0)
+    model.addNode(0, 3)
+    model.addElement(1, 2, E=3e10, A=1e-3, I=1.7e-6, rho=2500)
+    model.addSupport(1, 'S1')
+    model.assemble()
+    solution = model.solve()
+    model.getFrequencies()
+"""
+from utils import *
+import node
+import element
+import bc
+import solver
+import modelfile
+from modelfile import SUPPORT_TYPES
+
+class Model():
+    def __init__(self):
+        self.nset = node.NodeSet()
+        self.eset = element.ElementSet()
+        self.sset = bc.SupportSet()
+        self.solution = None
+        self.lastSolution = None
+
+    def addNode(self, x, y, id=None):
+        """
+        Adds a node at (x, y). Nodes must be defined before elements.
+        Returns the ID of the new node.
+        """
+        if self.eset.members:
+            raise ValueError("Nodes must be defined before elements")
+        id = self.nset.getNextID() if id is None else id
+        newNode = node.createNode(self.nset, float(x), float(y), id)
+        if not newNode:
+            raise ValueError(f"Node {id} at ({x}, {y}) duplicates an existing node ID or position")
+        self.nset.add(newNode)
+        return id
+
+    def addElement(self, na, nb, E, A, I, rho, hingeA=False, hingeB=False, id=None):
+        """
+        Adds an element between the nodes with IDs na and nb, optionally with hinges at its ends.
+        Returns the ID of the new element.
+        """
+        if not self.eset.members:
+            self.nset.assignDOFs()
+        nodeA, nodeB = self.nset.getEntityWithID(na), self.nset.getEntityWithID(nb)
+        if not (nodeA and nodeB):
+            raise ValueError(f"Nodes {na} and {nb} must exist to define an element")
+        id = self.eset.getNextID() if id is None else id
+        elprop = {'E':float(E), 'A':float(A), 'I':float(I), 'rho':float(rho)}
+        if not element.addElement(self.nset, self.eset, id, nodeA, nodeB, elprop, hingeA, hingeB):
+            raise ValueError(f"Element {id} between nodes {na} and {nb} duplicates an existing element")
+        self.solution = None
+        return id
+
+    def setElementProperties(self, id, **prop):
+        """
+        Changes properties (E, A, I, rho) of the element with the given ID.
+        The assembled global matrices are updated incrementally.
+        """
+        elem = self.eset.getEntityWithID(id)
+        if not elem:
+            raise ValueError(f"Element {id} does not exist")
+        self.eset.updateElementProperties(id, {**elem.getProp(), **{key:float(value) for key, value in prop.items()}})
+        self.solution = None
+
+    def setMassType(self, massType):
+        """
+        Sets the mass formulation of the model, 'consistent' (default) or 'lumped' (diagonal, HRZ).
+        With the lumped mass, the eigenvalue problem is solved as a cheaper standard eigenvalue problem.
+        """
+        self.eset.setMassType(massType)
+        self.solution = None
+
+    def setSubdivision(self, nsub, elementIDs=None):
+        """
+        Subdivides the elements with the given IDs, or by default all elements, into nsub elements each at the next assembly,
+        which resolves the higher modes. The internal nodes and elements are generated only for the computations,
+        so element IDs, properties and sensitivities keep referring to the elements as added.
+        """
+        self.eset.setSubdivision(nsub, elementIDs)
+        self.solution = None
+
+    def addSupport(self, nodeID, supportType='S1'):
+        """
+        Adds a support of the given type ('S1'-'S6', see README) at the node with ID nodeID
+        """
+        supportNode = self.nset.getEntityWithID(nodeID)
+        if (not supportNode) or self.sset.foundAtNode(nodeID)[0]:
+            raise ValueError(f"Cannot add support at node {nodeID}")
+        self.sset.add(bc.createSupport(self.nset, SUPPORT_TYPES.index(supportType), supportNode))
+        self.solution = None
+
+    def assemble(self, sparse=None, renumber=False):
+        """
+        Assembles the global stiffness and mass matrices.
+        With renumber=True the dofs are first renumbered to minimize the bandwidth of the matrices (reverse Cuthill-McKee),
+        which speeds up the 'banded' engine. Results are reported in the original dof numbering.
+        """
+        element.assembleModel(self.nset, self.eset, sparse, renumber)
+
+    def check(self):
+        """
+        Returns (ok, message) of the model check
+        """
+        ok, message, _ = solver.checkModel(self.nset, self.eset, self.sset)
+        return ok, message
+
+    def solve(self, engine='dense', nmodes=10, band=None, reduction=None, masters=None):
+        """
+        Solves the eigenvalue problem with the 'dense', 'sparse', 'banded' or 'warm' (from the last solution) engine,
+        optionally within band = (fmin, fmax) [Hz] or reduced with reduction='guyan' onto the master dofs
+        (1-based, in the dof numbering before any renumbering, by default all translational dofs).
+        The modes are numbered consistently with the last solution in solution['identity'].
+        Returns the solution dictionary, see solver.solveModel.
+        """
+        previous = solver.previousEigenvectors(self.lastSolution, self.eset)
+        if masters is not None:
+            masters = np.flatnonzero(np.isin(self.eset.getOriginalDofs(self.eset.getStiffnessMatrix().shape[0]), masters)) + 1
+        self.solution = solver.solveModel(self.eset, self.sset, engine, nmodes, band, previous, reduction, masters)
+        if self.solution is not None:
+            solver.identifyModes(self.solution, self.lastSolution)
+            self.lastSolution = self.solution
+        return self.solution
+
+    def getFrequencies(self):
+        """
+        Returns the natural frequencies [Hz] of the solved model
+        """
+        return np.sqrt(self.solution['eigenvalues'])/(2*np.pi)
+
+    def getReductionError(self):
+        """
+        Returns the relative frequency errors f_reduced/f_full - 1 of the modes of a reduced solution (see solve),
+        computed against the full solution of the same lowest modes
+        """
+        reduction = self.solution.get('reduction')
+        if reduction is None:
+            raise ValueError("The model was solved without reduction")
+        if 'error' not in reduction:
+            reduction['error'] = solver.reductionError(self.eset, self.sset, self.solution)
+        return reduction['error']
+
+    def getModes(self):
+        """
+        Returns the mass-normalized eigenvectors (ndof x n_modes) of the solved model,
+        with the rows in the dof numbering before any renumbering
+        """
+        dofs = self.solution['dofs']
+        return solver.alignEigenvectors(self.solution['eigenvectors'], dofs, np.arange(1, dofs.size + 1))
+
+    def getSensitivities(self, relative=False):
+        """
+        Returns the derivatives df/dp [Hz per unit] of the natural frequencies with respect to p = E, A, I, rho of each element,
+        or p/f df/dp with relative=True, see solver.computeSensitivities
+        """
+        return solver.computeSensitivities(self.solution, relative=relative)
+
+    def getModeShape(self, eigenmode, scale=1):
+        """
+        Returns the deformed coordinates (exc, eyc), each with size (n_mesh_elements x 21),
+        of the given (1-based) eigenmode, scaled relative to the default scale factor
+        """
+        self.solution['scale'] = scale
+        return solver.getDeformedShape(self.solution, eigenmode)
+
+    @classmethod
+    def fromDict(cls, data):
+        """
+        Builds a model from a dictionary in the model file format (see modelfile.py)
+        """
+        model = cls()
+        model.nset, model.eset, model.sset = modelfile.buildModelSets(data)
+        return model
+
+    def toDict(self):
+        """
+        Returns the model dictionary in the model file format (see modelfile.py)
+        """
+        return modelfile.modelToDict(self.nset, self.eset, self.sset)
+
+    def save(self, path):
+        """
+        Saves the model to a JSON or .npz (if path ends with .npz) model file
+        """
+        modelfile.writeModelFile(path, self.toDict())
+
+def loadModel(path):
+    """
+    Loads a model from a JSON or .npz model file
+    """
+    return Model.fromDict(modelfile.readModelFile(path))
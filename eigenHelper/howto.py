@@ -1,4 +1,3 @@
-from bokeh.models import Div, Toggle
 from utils import *
 
 
@@ -50,6 +49,7 @@ def toggleHelp(attr, old, new, htModule):
 HowTo module layout
 """
 def createHowToLayout():
+    from bokeh.models import Div, Toggle
     howtotext, colors = createHowToContent()
     titletext = makeTitle()
     divHowto =  Div(text= titletext + converttohtml(howtotext,True,colors), width=1000, height=350, visible=False)
@@ -1,3 +1,4 @@
+import sys
 from bokeh.io import curdoc
 from bokeh.layouts import column, row, Spacer
 from functools import partial
@@ -8,9 +9,10 @@ from bc import *
 from plot import *
 from solver import *
 from howto import *
+from modelfile import *
 
 
-def modify_doc(doc, debug=False):
+def modify_doc(doc, debug=False, clientRendering=False):
 
     #Create Node module
     ndic = createNodeLayout(debug)
@@ -22,13 +24,16 @@ def modify_doc(doc, debug=False):
     bcdic = createBCLayout(debug)
 
     #Create Solver module
-    soldic = createSolverLayout(debug)
+    soldic = createSolverLayout(debug, clientRendering, doc)
 
     #Create Instructions module
     hdic = createHowToLayout()
 
+    #Create Model file module
+    fdic = createFileLayout()
+
     #Create Plot module
-    p,  lsets, ncds, ecds, scds, mcds = createPlotLayout(ndic['nset'], edic['eset'], bcdic['sset'])
+    p,  lsets, ncds, ecds, scds, mcds = createPlotLayout(ndic['nset'], edic['eset'], bcdic['sset'], soldic)
 
 
     """
@@ -52,7 +57,10 @@ def modify_doc(doc, debug=False):
     edic['delAllElemButton'].on_click(partial(delAllElemOnClick, nModule=ndic, elModule=edic, bcModule=bcdic, solModule=soldic, \
         htModule=hdic, nodeCDS=ncds, elemCDS=ecds, ssetCDS=scds, modeCDS=mcds, debugInfo=debug))
     edic['assembleButton'].on_click(partial(assembleOnClick, nModule=ndic, elModule=edic, bcModule=bcdic, solModule=soldic, \
-        htModule=hdic, nodeCDS=ncds, debugInfo=debug))
+        htModule=hdic, nodeCDS=ncds, modeCDS=mcds, debugInfo=debug))
+    edic['massSelect'].on_change('value', partial(changeAssemblyOptions, elModule=edic, solModule=soldic))
+    edic['renumberWidget'].on_change('active', partial(changeAssemblyOptions, elModule=edic, solModule=soldic))
+    edic['subdivisionWidget'].on_change('value', partial(changeAssemblyOptions, elModule=edic, solModule=soldic))
     edic['elemLabelsToggle'].on_change('active', partial(toggleElementLabels, labels=lsets))
     edic['showElemInfoToggle'].on_change('active', partial(toggleElementInfo, elModule=edic))
 
@@ -68,9 +76,17 @@ def modify_doc(doc, debug=False):
     soldic['checkModelButton'].on_click(partial(checkModelOnClick, nModule=ndic, elModule=edic, bcModule=bcdic, solModule=soldic, \
         htModule=hdic, modeCDS=mcds))
     soldic['solveButton'].on_click(partial(solveOnClick, elModule=edic, bcModule=bcdic, solModule=soldic, htModule=hdic, modeCDS=mcds))
-    soldic['modeSpinner'].on_change('value', partial(changeEigenmode, solModule=soldic, modeCDS=mcds))
-    soldic['scaleSlider'].on_change('value', partial(changeScale, elModule=edic, solModule=soldic, modeCDS=mcds))
-    soldic['flipButton'].on_click(partial(flip, elModule=edic, solModule=soldic, modeCDS=mcds))
+    soldic['cancelButton'].on_click(partial(cancelOnClick, solModule=soldic))
+    soldic['sensitivitySelect'].on_change('value', partial(changeSensitivity, solModule=soldic, modeCDS=mcds))
+    if not clientRendering:
+        #with client-side rendering, mode selection, scaling and flipping are handled by CustomJS callbacks (see plot.py)
+        soldic['modeSpinner'].on_change('value', partial(changeEigenmode, solModule=soldic, modeCDS=mcds))
+        soldic['scaleSlider'].on_change('value', partial(changeScale, solModule=soldic, modeCDS=mcds))
+        soldic['flipButton'].on_click(partial(flip, solModule=soldic, modeCDS=mcds))
+
+    fdic['importInput'].on_change('value', partial(importModelOnChange, nModule=ndic, elModule=edic, bcModule=bcdic, solModule=soldic, \
+        htModule=hdic, nodeCDS=ncds, elemCDS=ecds, ssetCDS=scds, modeCDS=mcds, debugInfo=debug))
+    fdic['exportButton'].on_click(partial(exportModelOnClick, fileModule=fdic, nModule=ndic, elModule=edic, bcModule=bcdic))
 
     hdic['showHelpToggle'].on_change('active', partial(toggleHelp, htModule = hdic))
     """
@@ -84,7 +100,8 @@ def modify_doc(doc, debug=False):
     elemLayout =  column(edic['divLine'], \
         row(column(edic['enaWidget'], edic['hinaWidget'], edic['eYoungWidget'], edic['eAreaWidget'], \
                             edic['addElemButton'], edic['assembleButton']), \
-            column(edic['enbWidget'], edic['hinbWidget'], edic['eDensityWidget'], edic['eInertiaWidget']), \
+            column(edic['enbWidget'], edic['hinbWidget'], edic['eDensityWidget'], edic['eInertiaWidget'], edic['massSelect'], \
+                edic['renumberWidget'], edic['subdivisionWidget']), \
             column(edic['eIDWidget'], Spacer(height=28), edic['delElNumWidget'], Spacer(height=19),\
                         edic['delElemButton'], edic['delAllElemButton'])))
 
@@ -92,10 +109,14 @@ def modify_doc(doc, debug=False):
         row(column(bcdic['rbg'], bcdic['rbgDiv'], row(column(bcdic['addToNodeWidget'], bcdic['addSupportButton']), Spacer(width=162),\
             column(bcdic['deleteFromNodeWidget'], bcdic['deleteSupportButton'], bcdic['deleteAllSupportsButton']) ))))
 
-    solLayout = column(row(soldic['checkModelButton'], soldic['solveButton']), \
+    fileLayout = column(fdic['divLine'], row(fdic['importInput'], fdic['exportFormatSelect'], fdic['exportButton']))
+
+    solLayout = column(row(soldic['engineSelect'], soldic['nModesWidget'], soldic['reductionSelect'], soldic['fminWidget'], soldic['fmaxWidget']), \
+        row(Spacer(width=345), soldic['compareWidget']), \
+        row(soldic['checkModelButton'], soldic['solveButton'], soldic['cancelButton']), \
         row(soldic['modeSpinner'], Spacer(width=100), \
             soldic['scaleSlider'], \
-            column(Spacer(height=10), soldic['flipButton'])))
+            column(Spacer(height=10), soldic['flipButton']), Spacer(width=20), soldic['sensitivitySelect']))
 
     plotLayout = column( row(Spacer(width=30), soldic['divSolver']), \
                          row(Spacer(width = 30), ndic['nodeLabelsToggle'], Spacer(width=10), edic['elemLabelsToggle']), \
@@ -107,8 +128,11 @@ def modify_doc(doc, debug=False):
 
     howtoLayout = column(hdic['showHelpToggle'], hdic['divHowto'])
 
-    layout = column(howtoLayout, row(column(nodeLayout, elemLayout, bcLayout), plotLayout, divLayout))
+    layout = column(howtoLayout, row(column(nodeLayout, elemLayout, bcLayout, fileLayout), plotLayout, divLayout))
     doc.add_root(layout)
+    #the export source is not part of the layout, but must be synchronized to trigger downloads
+    doc.add_root(fdic['exportCDS'])
     doc.title = "eigenHelper"
 
-modify_doc(curdoc(),debug=False)
+#client-side mode rendering is enabled with: bokeh serve eigenHelper --args --client-rendering
+modify_doc(curdoc(),debug=False, clientRendering='--client-rendering' in sys.argv[1:])
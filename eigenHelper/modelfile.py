@@ -0,0 +1,274 @@
+"""
+Model file module: bulk import and export of models
+Model files are JSON (.json) or compressed NumPy (.npz) files with one array per field:
+{
+    "nodes":    {"id": [...], "x": [...], "y": [...]},
+    "elements": {"id": [...], "na": [...], "nb": [...], "E": [...], "A": [...], "I": [...], "rho": [...],
+                 "hingeA": [...], "hingeB": [...], "nsub": [...]},
+    "supports": {"node": [...], "type": ["S1", ...]},
+    "model":    {"mass": "consistent", "subdivisions": 1}
+}
+In .npz files the arrays are stored under the keys <group>_<field>, e.g. nodes_x or elements_hingeA.
+Nodes with coincident coordinates are merged on import into the first of them, and elements collapsed by the merge are dropped.
+The hinge fields are optional (no hinges by default), and so are the elements and supports groups.
+The optional nsub field subdivides single elements into nsub elements at assembly (0 for the model default).
+The model group is optional as well, with the mass formulation "consistent" (default) or "lumped",
+and the number of elements each element is subdivided into by default (1, i.e. no subdivision, by default).
+"""
+import base64
+import io
+import json
+import zipfile
+from functools import partial
+from utils import *
+import node
+import element
+import bc
+import solver
+import howto
+
+SUPPORT_TYPES = ['S1', 'S2', 'S3', 'S4', 'S5', 'S6']
+
+#triggers a browser download of the base64 encoded file content shipped in the export source
+DOWNLOAD_JS = """
+const content = source.data['content'][0];
+if (!content) {
+    return;
+}
+const raw = atob(content);
+const bytes = new Uint8Array(raw.length);
+for (let i = 0; i < raw.length; i++) {
+    bytes[i] = raw.charCodeAt(i);
+}
+const link = document.createElement('a');
+link.href = URL.createObjectURL(new Blob([bytes], {type: 'application/octet-stream'}));
+link.download = source.data['filename'][0];
+document.body.appendChild(link);
+link.click();
+document.body.removeChild(link);
+URL.revokeObjectURL(link.href);
+"""
+
+def parseModel(content):
+    """
+    Parses the bytes of a JSON or .npz model file (detected from the content) into a model dictionary
+    """
+    try:
+        if content[:2] == b'PK':
+            data = {}
+            with np.load(io.BytesIO(content), allow_pickle=False) as arrays:
+                for key in arrays.files:
+                    group, field = key.split('_', 1)
+                    data.setdefault(group, {})[field] = arrays[key]
+            return data
+        return json.loads(content)
+    except (ValueError, OSError, zipfile.BadZipFile) as err:
+        raise ValueError(f"Unreadable model file ({err})")
+
+def readModelFile(path):
+    """
+    Reads a JSON or .npz model file into a model dictionary
+    """
+    with open(path, 'rb') as modelFile:
+        return parseModel(modelFile.read())
+
+def serializeModel(data, npz=False):
+    """
+    Returns the bytes of a model file with the model dictionary data, in JSON or .npz format
+    """
+    if npz:
+        buffer = io.BytesIO()
+        arrays = {f'{group}_{field}':np.asarray(values) for group, fields in data.items() for field, values in fields.items()}
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+    return json.dumps(data).encode()
+
+def writeModelFile(path, data):
+    """
+    Writes the model dictionary data to a model file, in .npz format if path ends with .npz and JSON otherwise
+    """
+    with open(path, 'wb') as modelFile:
+        modelFile.write(serializeModel(data, npz=path.endswith('.npz')))
+
+def getColumn(data, group, field, dtype, default=None):
+    """
+    Returns a field of the model dictionary as a 1D array with the given dtype
+    """
+    fields = data.get(group, {})
+    if field not in fields:
+        if default is None:
+            raise ValueError(f"Missing field {group}.{field}")
+        return np.full(len(fields.get('id', [])), default, dtype=dtype)
+    try:
+        return np.asarray(fields[field], dtype=dtype).ravel()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid values in field {group}.{field}")
+
+def buildModelSets(data):
+    """
+    Builds new node, element and support sets, ready for assembly, from a model dictionary.
+    Raises ValueError for invalid models. Returns (nset, eset, sset).
+    """
+    nid = getColumn(data, 'nodes', 'id', np.int64)
+    x, y = getColumn(data, 'nodes', 'x', float), getColumn(data, 'nodes', 'y', float)
+    if not (nid.size == x.size == y.size):
+        raise ValueError("Node fields have different lengths")
+    if (nid <= 0).any() or np.unique(nid).size != nid.size:
+        raise ValueError("Node IDs must be unique positive integers")
+    nset = node.NodeSet()
+    for id, ix, iy in zip(nid.tolist(), x.tolist(), y.tolist()):
+        nset.add(node.Node(ix, iy, id))
+    #coincident nodes (e.g. of imported CAD geometry) are merged into the first one, and referred to by its ID
+    merged = nset.mergeCoincidentNodes()
+    nset.assignDOFs()
+
+    eid, fields = np.array([], dtype=np.int64), []
+    if 'elements' in data:
+        eid = getColumn(data, 'elements', 'id', np.int64)
+        fields = [getColumn(data, 'elements', f, np.int64) for f in ['na', 'nb']] + \
+            [getColumn(data, 'elements', f, float) for f in ['E', 'A', 'I', 'rho']] + \
+            [getColumn(data, 'elements', f, bool, False) for f in ['hingeA', 'hingeB']] + \
+            [getColumn(data, 'elements', 'nsub', np.int64, 0)]
+    if eid.size:
+        if any(f.size != eid.size for f in fields):
+            raise ValueError("Element fields have different lengths")
+        if (eid <= 0).any() or np.unique(eid).size != eid.size:
+            raise ValueError("Element IDs must be unique positive integers")
+        if not np.isin(np.concatenate(fields[:2]), nid).all():
+            raise ValueError("Elements refer to undefined nodes")
+        if (np.stack(fields[2:6]) <= 0).any():
+            raise ValueError("Element properties E, A, I and rho must be positive")
+        if (fields[8] < 0).any():
+            raise ValueError("Element subdivisions must be non-negative integers")
+    massType = np.asarray(data.get('model', {}).get('mass', 'consistent')).ravel()
+    if massType.size != 1 or str(massType[0]) not in element.MASS_TYPES.values():
+        raise ValueError(f"Model mass must be one of {', '.join(element.MASS_TYPES.values())}")
+    subdivisions = np.asarray(data.get('model', {}).get('subdivisions', 1)).ravel()
+    if subdivisions.size != 1 or not np.issubdtype(subdivisions.dtype, np.integer) or subdivisions[0] < 1:
+        raise ValueError("Model subdivisions must be a positive integer")
+    eset = element.ElementSet()
+    eset.setMassType(str(massType[0]))
+    eset.setSubdivision(int(subdivisions[0]))
+    for id, na, nb, E, A, I, rho, hingeA, hingeB, nsub in zip(eid.tolist(), *[f.tolist() for f in fields]):
+        nodeA, nodeB = nset.getEntityWithID(merged.get(na, na)), nset.getEntityWithID(merged.get(nb, nb))
+        if (nodeA is nodeB) and (na != nb):
+            #collapsed by merging its coincident end nodes
+            continue
+        if (nodeA is nodeB) or eset.foundNodes(nodeA, nodeB):
+            raise ValueError(f"Element {id} between nodes {na} and {nb} is degenerate or duplicated")
+        newElement = element.Element(id, nodeA, nodeB, {'E':E, 'A':A, 'I':I, 'rho':rho}, (hingeA, hingeB))
+        newElement.nsub = nsub or None
+        eset.add(newElement)
+    if eset.members:
+        eset.setNdof()
+
+    snode, stype = np.array([], dtype=np.int64), np.array([], dtype=str)
+    if 'supports' in data:
+        snode, stype = getColumn(data, 'supports', 'node', np.int64), getColumn(data, 'supports', 'type', str)
+    if snode.size != stype.size:
+        raise ValueError("Support fields have different lengths")
+    if not np.isin(stype, SUPPORT_TYPES).all():
+        raise ValueError(f"Support types must be one of {', '.join(SUPPORT_TYPES)}")
+    sset = bc.SupportSet()
+    for id, supportType in zip(snode.tolist(), stype.tolist()):
+        supportNode = nset.getEntityWithID(merged.get(id, id))
+        if not supportNode:
+            raise ValueError(f"Support at undefined node {id}")
+        if sset.foundAtNode(supportNode.getID())[0]:
+            raise ValueError(f"More than one support at node {id}")
+        sset.add(bc.Support(SUPPORT_TYPES.index(supportType), supportNode))
+    return nset, eset, sset
+
+def modelToDict(nset, eset, sset):
+    """
+    Returns the model dictionary of the node, element and support sets
+    """
+    nodes = nset.members
+    releases = eset.getReleases()
+    E, A, I, rho = eset.getProperties()
+    return {
+        'nodes':{'id':[n.getID() for n in nodes], 'x':[n.getX() for n in nodes], 'y':[n.getY() for n in nodes]},
+        'elements':{'id':[el.getID() for el in eset.members], 'na':[el.na.getID() for el in eset.members], \
+            'nb':[el.nb.getID() for el in eset.members], 'E':E, 'A':A, 'I':I, 'rho':rho, \
+            'hingeA':releases[:,0].tolist(), 'hingeB':releases[:,1].tolist(), 'nsub':[el.nsub or 0 for el in eset.members]},
+        'supports':{'node':[s.getNode().getID() for s in sset.members], \
+            'type':[s.getType() for s in sset.members]},
+        'model':{'mass':eset.massType, 'subdivisions':eset.nsub}
+    }
+
+"""
+Model file module callbacks
+"""
+def buildImportedModel(content, renumber=False):
+    """
+    Builds and assembles the sets of an imported model file content, in a background task.
+    Returns (nset, eset, sset), or the error message of an invalid model.
+    """
+    try:
+        nset, eset, sset = buildModelSets(parseModel(base64.b64decode(content)))
+    except (ValueError, TypeError, KeyError) as err:
+        #malformed files fail with type and key errors before they can be validated
+        return f"Model import failed: {err}"
+    if eset.members:
+        element.assembleModel(nset, eset, renumber=renumber)
+    return nset, eset, sset
+
+def importModelOnChange(attr, old, new, nModule, elModule, bcModule, solModule, htModule, nodeCDS, elemCDS, ssetCDS, modeCDS, debugInfo):
+    #the new sets are private to the task until it finishes, so the current model stays usable meanwhile
+    solver.submitTask(solModule, 'import', partial(buildImportedModel, new, bool(elModule['renumberWidget'].active)), \
+        partial(finishImport, nModule=nModule, elModule=elModule, bcModule=bcModule, solModule=solModule, htModule=htModule, \
+            nodeCDS=nodeCDS, elemCDS=elemCDS, ssetCDS=ssetCDS, modeCDS=modeCDS, debugInfo=debugInfo), "Importing model\u2026")
+
+def finishImport(sets, nModule, elModule, bcModule, solModule, htModule, nodeCDS, elemCDS, ssetCDS, modeCDS, debugInfo):
+    if isinstance(sets, str):
+        solver.printMessage(sets, "red", solModule['divSolver'])
+        return
+    #tasks of the replaced model are obsolete
+    for kind in ['assemble', 'check', 'solve']:
+        solver.cancelTask(solModule, kind)
+    solver.clearSolution(solModule)
+    nset, eset, sset = sets
+    nModule['nset'], elModule['eset'], bcModule['sset'] = nset, eset, sset
+    elModule['massSelect'].value = {v:k for k, v in element.MASS_TYPES.items()}[eset.massType]
+    elModule['subdivisionWidget'].value = eset.nsub
+    nModule['nIDWidget'].value = nset.getNextID()
+    nModule['assignDOFsButton'].disabled = True
+    node.deactivateNodeModule(nModule)
+    node.updateNodeText(nModule['divNodes'], nset, True, debugInfo)
+    element.activateElementModule(elModule, debugInfo)
+    elModule['eIDWidget'].value = eset.getNextID()
+    if eset.members:
+        elModule['assembleButton'].disabled = True
+        element.updateElementText(elModule['divElements'], eset, True, debugInfo)
+        bc.activateBCModule(bcModule)
+    else:
+        bc.deactivateBCModule(bcModule, htModule)
+    bc.updateSupportText(bcModule['divSupports'], sset, False, debugInfo)
+    #the plot sources are updated once for the whole model
+    node.updateCoordData(nset, nodeCDS)
+    element.updateElementData(eset, elemCDS)
+    bc.updateSupportData(sset, ssetCDS)
+    solver.checkModelOnClick(nModule, elModule, bcModule, solModule, htModule, modeCDS)
+
+def exportModelOnClick(fileModule, nModule, elModule, bcModule):
+    npz = fileModule['exportFormatSelect'].value == 'NumPy (.npz)'
+    content = serializeModel(modelToDict(nModule['nset'], elModule['eset'], bcModule['sset']), npz)
+    fileModule['exportCount'] += 1
+    fileModule['exportCDS'].data = {'content':[base64.b64encode(content).decode()], \
+        'filename':['eigenHelper_model.npz' if npz else 'eigenHelper_model.json'], 'count':[fileModule['exportCount']]}
+
+"""
+Model file module layout
+"""
+def createFileLayout():
+    from bokeh.models import Div, FileInput, Button, Select, ColumnDataSource, CustomJS
+    importInput = FileInput(accept='.json,.npz', width=250)
+    exportFormatSelect = Select(options=['JSON', 'NumPy (.npz)'], value='JSON', width=120)
+    exportButton = Button(label="Export Model", button_type="default", width=100)
+    exportCDS = ColumnDataSource(data={'content':[''], 'filename':[''], 'count':[0]})
+    exportCDS.js_on_change('data', CustomJS(args={'source':exportCDS}, code=DOWNLOAD_JS))
+    divLine = Div(text= '<hr noshade width="400"><b>Import / export model:</b>', visible=True)
+
+    fileLayoutDict = {'importInput':importInput, 'exportFormatSelect':exportFormatSelect, 'exportButton':exportButton, \
+        'exportCDS':exportCDS, 'exportCount':0, 'divLine':divLine}
+    return fileLayoutDict
@@ -1,9 +1,8 @@
 """
 Node module with helper function and classes
 """
-from bokeh.models import Div, NumericInput, Button, Toggle
 from utils import *
-from copy import deepcopy
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 import element
 import bc
 import solver
@@ -14,8 +13,8 @@ class Node():
         self.coords=[x,y]
         self.id = id
         self.dofs = []
-        self.dangling = False
-        self.hinge = False
+        #number of hinged (released) element ends at the node
+        self.hinges = 0
 
     def printInfo(self, debug=False):
         if debug:
@@ -27,7 +26,7 @@ class Node():
         return self.id
 
     def getName(self):
-        return str(self.getID())+'-H' if self.hinge else str(self.getID())
+        return str(self.getID())
 
     def getX(self):
         return self.coords[0]
@@ -47,27 +46,77 @@ class Node():
     def setDOFs(self, dofArray):
         self.dofs = dofArray
 
-    def duplicateAsHinge(self, hingeid, nextdof):
-        hingeNode = deepcopy(self)
-        hingeNode.setID(hingeid)
-        hingeNode.markAsHinge()
-        hingeNode.dofs[-1] = nextdof
-        danglingDof = self.markAsDangling()
-        return hingeNode, danglingDof
-
-    def markAsDangling(self):
-        self.dangling = True
-        return self.dofs[-1]
-
-    def markAsHinge(self):
-        self.hinge = True
 
 class NodeSet(EntitySet):
+    """
+    Set of nodes with a grid-hash spatial index for finding coincident nodes.
+    The grid cell size equals the coincidence tolerance, so only the 3x3 neighbouring cells
+    of a point need to be searched.
+    """
+    tolerance = 1e-6
+
+    def __init__(self):
+        EntitySet.__init__(self)
+        self.grid = {}
+
+    def getCell(self, x, y):
+        return (int(np.floor(x/self.tolerance)), int(np.floor(y/self.tolerance)))
+
+    def add(self, newNode):
+        EntitySet.add(self, newNode)
+        self.grid.setdefault(self.getCell(newNode.getX(), newNode.getY()), []).append(newNode)
+
+    def deleteEntityWithID(self, nodeID):
+        node = self.getEntityWithID(nodeID)
+        if node:
+            cell = self.getCell(node.getX(), node.getY())
+            self.grid[cell].remove(node)
+            if not self.grid[cell]:
+                del self.grid[cell]
+        EntitySet.deleteEntityWithID(self, nodeID)
+
+    def clear(self):
+        EntitySet.clear(self)
+        self.grid = {}
+
+    def findNodesAt(self, x, y, tol=None):
+        """
+        Returns the nodes whose coordinates coincide with (x, y) within the tolerance
+        """
+        tol = self.tolerance if tol is None else tol
+        cx, cy = self.getCell(x, y)
+        reach = int(np.ceil(tol/self.tolerance))
+        if (2*reach + 1)**2 > len(self.members):
+            #a tolerance much larger than the grid cells covers more cells than there are nodes
+            candidates = self.members
+        else:
+            candidates = [node for i in range(cx-reach, cx+reach+1) for j in range(cy-reach, cy+reach+1) \
+                for node in self.grid.get((i,j), [])]
+        return [node for node in candidates if (abs(node.getX() - x) <= tol) and (abs(node.getY() - y) <= tol)]
+
     def foundCoords(self,x,y):
+        return len(self.findNodesAt(x, y)) > 0
+
+    def mergeCoincidentNodes(self, tol=None):
+        """
+        Merges nodes with coincident coordinates (within tol), keeping the first node
+        (in insertion order) of each group.
+        Intended for imported geometry, before elements are created.
+        Returns a dictionary {removed node ID: kept node ID}, which can be used to renumber connectivity.
+        """
+        tol = self.tolerance if tol is None else tol
+        kept = NodeSet()
+        kept.tolerance = max(tol, self.tolerance)
+        merged = {}
         for node in self.members:
-            if (abs(node.getX() - x) <= 1e-6) and (abs(node.getY() - y) < 1e-6):
-                return True
-        return False
+            coincident = kept.findNodesAt(node.getX(), node.getY(), tol)
+            if coincident:
+                merged[node.getID()] = coincident[0].getID()
+            else:
+                kept.add(node)
+        for nodeID in merged:
+            self.deleteEntityWithID(nodeID)
+        return merged
 
     def getExEy(self):
         xlist = []
@@ -77,11 +126,11 @@ class NodeSet(EntitySet):
         ylist_h = []
         idlist_h = []
         for node in self.members:
-            if not node.hinge:
-                xlist.append(node.getX())
-                ylist.append(node.getY())
-                idlist.append(str(node.getID()))
-            else:
+            xlist.append(node.getX())
+            ylist.append(node.getY())
+            idlist.append(str(node.getID()))
+            #nodes with hinged element ends are listed again for the hinge symbol
+            if node.hinges:
                 xlist_h.append(node.getX())
                 ylist_h.append(node.getY())
                 idlist_h.append(str(node.getID()))
@@ -91,31 +140,33 @@ class NodeSet(EntitySet):
         for i, node in enumerate(self.members):
             node.setDOFs(np.array([3*(i+1)-2, 3*(i+1)-1, 3*(i+1)], dtype=np.int32))
 
-    def getNextDOF(self):
-        maxdof = np.NINF
-        for member in self.members:
-            if max(member.getDOFs()) > maxdof:
-                maxdof = max(member.getDOFs())
-        if maxdof == np.NINF:
-            maxdof = 0
-        return maxdof + 1
-
-    def cleanUpAfterHinges(self, danglingDofs):
-        flagged = []
+    def renumberDOFs(self, edof, ndof):
+        """
+        Renumbers the dofs of all nodes in the reverse Cuthill-McKee order of the element topology edof,
+        unconnected dofs last. Returns newDofs, where newDofs[d-1] is the new number of the previous dof d.
+        """
+        rows, cols = element.edofEntries(edof)
+        graph = sp.csr_matrix((np.ones(rows.size), (rows, cols)), shape=(ndof, ndof))
+        connected = np.zeros(ndof, dtype=bool)
+        connected[rows] = True
+        order = reverse_cuthill_mckee(graph, symmetric_mode=True)
+        order = np.concatenate((order[connected[order]], np.flatnonzero(~connected)))
+        newDofs = np.zeros(ndof, dtype=np.int32)
+        newDofs[order] = np.arange(1, ndof+1)
         for node in self.members:
-            if (node.getDOFs()[-1] in danglingDofs) and (node not in flagged):
-                flagged.append(node)
+            node.setDOFs(newDofs[np.asarray(node.getDOFs()) - 1])
+        return newDofs
 
-        for danglingNode in flagged:
-            self.deleteEntityWithID(danglingNode.getID())
+    def getMaxDOF(self):
+        return max((int(np.max(node.getDOFs())) for node in self.members if len(node.getDOFs())), default=0)
 
-    def removeHinges(self):
-        todelete = []
+    def getNodeNamesWithDOFs(self, dofs):
+        names = []
         for node in self.members:
-            if node.hinge:
-                todelete.append(node.getID())
-        for hid in todelete:
-            self.deleteEntityWithID(hid)
+            if np.isin(node.getDOFs(), dofs).any():
+                names.append(node.getName())
+        return names
+
 
 
 def createNode(nodeset, x, y, id):
@@ -224,6 +275,7 @@ def delAllNodesOnClick(nModule, elModule, bcModule, solModule, htModule, nodeCDS
 def assignDOFsOnClick(nModule, elModule, solModule, htModule, debugInfo):
     if nModule['nset'].getSize() >= 2:
         nModule['nset'].assignDOFs()
+        solver.clearSolution(solModule)
         updateNodeText(nModule['divNodes'], nModule['nset'], True, debugInfo)
         htModule['colors'][1] = 'green'
         howto.updateHowtoDiv(htModule)
@@ -242,6 +294,7 @@ def toggleNodeInfo(attr, old, new, nModule):
 Node module layout
 """
 def createNodeLayout(debug=False):
+    from bokeh.models import Div, NumericInput, Button, Toggle
     nset = NodeSet()
     nIDWidget = NumericInput(value=1, title="Node ID:",mode='int', width=50,height=50)
     nXWidget = NumericInput(value=0, title="x [m]:",mode='float', width=75,height=50)
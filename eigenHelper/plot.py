@@ -1,8 +1,50 @@
 from bokeh.models import ColumnDataSource, LabelSet, CustomJS, Label, HoverTool
 from bokeh.plotting import figure
+from bokeh.palettes import RdBu11
+from bokeh.transform import linear_cmap
 
+#JavaScript for client-side mode rendering: deformed shape = undeformed + sign*scale*sfac*(interpolated displacement)
+#the line data is modified in place and re-rendered with change.emit(), so nothing is sent back to the server
+RENDER_MODE_JS = """
+const m = spinner.value - 1;
+if (m < 0 || m >= shapes.data['ux'].length) {
+    return;
+}
+const factor = shapes.data['sign'][m] * slider.value * shapes.data['sfac'][m];
+const ux = shapes.data['ux'][m];
+const uy = shapes.data['uy'][m];
+const xs = mode.data['x'];
+const ys = mode.data['y'];
+const x0 = mode.data['x0'];
+const y0 = mode.data['y0'];
+for (let i = 0; i < xs.length; i++) {
+    xs[i] = x0[i] + factor*ux[i];
+    ys[i] = y0[i] + factor*uy[i];
+}
+mode.change.emit();
+const values = sens ? sens.data['values'] : [];
+if (values.length) {
+    const value = sens.data['value'];
+    const shade = sens.data['shade'];
+    const shades = sens.data['shades'];
+    for (let i = 0; i < values.length; i++) {
+        value[i] = values[i][m];
+        shade[i] = shades[i][m];
+    }
+    sens.change.emit();
+}
+label.text = shapes.data['label'][m];
+"""
 
-def makePlot(nsetCDS, elsetCDS, ssetCDS, modeCDS, frequencyText):
+FLIP_MODE_JS = """
+const sign = shapes.data['sign'];
+for (let i = 0; i < sign.length; i++) {
+    sign[i] = -sign[i];
+}
+""" + RENDER_MODE_JS
+
+
+def makePlot(nsetCDS, elsetCDS, ssetCDS, modeCDS, frequencyText, shapeCDS=None, solModule=None, sensCDS=None):
     p = figure(width=750, height=550, match_aspect=True)
     ### NODES
     nodeRenderer = p.circle('x', 'y', source=nsetCDS[1], size=16, color="white", fill_alpha=1, line_color="black", level="overlay", legend_label="Nodes")
@@ -27,8 +69,24 @@ def makePlot(nsetCDS, elsetCDS, ssetCDS, modeCDS, frequencyText):
         anchor='top_center', source=ssetCDS[0], legend_label="Supports")
     p.image_url(url='urls', x='x', y='y', w='w', h='h', w_units='screen', h_units='screen', \
         anchor='center_left', source=ssetCDS[1], legend_label="Supports")
+    ### SENSITIVITY OVERLAY
+    #elements colored by their relative sensitivity (p/f)*df/dp for the shown mode, scaled to the largest magnitude
+    if sensCDS is not None:
+        sensRenderer = p.multi_line(xs='x', ys='y', source=sensCDS, line_width=8, alpha=0.7, \
+            line_color=linear_cmap('shade', RdBu11, -1, 1), legend_label="Sensitivity")
+        sensHover = HoverTool(show_arrow=False, line_policy='interp', renderers=[sensRenderer], \
+            tooltips=[("Element ID", "@IDs"), ("(p/f) df/dp", "@value{0.0000}")])
+        p.add_tools(sensHover)
     ### EIGENMODES
-    p.multi_line(xs='x', ys='y', source=modeCDS, line_width=5, line_color='black', legend_label="Eigenmode")
+    #mode shapes are sent as single NaN-separated x/y arrays, NaNs break the line between elements
+    p.line(x='x', y='y', source=modeCDS, line_width=5, line_color='black', legend_label="Eigenmode")
+    if (solModule is not None) and solModule['clientRendering']:
+        jsargs = dict(mode=modeCDS, shapes=shapeCDS, label=frequencyText, spinner=solModule['modeSpinner'], \
+            slider=solModule['scaleSlider'], sens=sensCDS)
+        renderMode = CustomJS(args=jsargs, code=RENDER_MODE_JS)
+        solModule['modeSpinner'].js_on_change('value', renderMode)
+        solModule['scaleSlider'].js_on_change('value', renderMode)
+        solModule['flipButton'].js_on_click(CustomJS(args=jsargs, code=FLIP_MODE_JS))
     ### LEGEND
     p.legend.location = "top_left"
     p.legend.click_policy="hide"
@@ -37,7 +95,7 @@ def makePlot(nsetCDS, elsetCDS, ssetCDS, modeCDS, frequencyText):
     lsets = {'nodes':nodeLabels, 'elements':elLabels}
     return p, lsets
 
-def createPlotLayout(nodeset, elemset, bcset):
+def createPlotLayout(nodeset, elemset, bcset, solModule=None):
     #Nodes CDS
     exey, exey_h = nodeset.getExEy()
     ncds = [ColumnDataSource({'x':exey[0], 'y':exey[1], 'IDs':exey[2]}), ColumnDataSource({'x':exey_h[0], 'y':exey_h[1], 'IDs':exey_h[2]})]
@@ -59,7 +117,10 @@ def createPlotLayout(nodeset, elemset, bcset):
         render_mode='css', border_line_color='black', border_line_alpha=0,
         background_fill_color='white', border_line_width=2, background_fill_alpha=1.0, visible=False)
     #Eigenmode CDS
-    modecds = ( ColumnDataSource({'x':[], 'y':[]}), freqText )
-    p, lsets = makePlot(ncds, ecds, scds, modecds[0], modecds[1])
+    #Eigenmode shapes CDS (one row per mode) for client-side rendering
+    #Sensitivity overlay CDS (one row per element, with the values of all shipped modes for client-side rendering)
+    modecds = ( ColumnDataSource({'x':[], 'y':[]}), freqText, ColumnDataSource({'ux':[], 'uy':[], 'freq':[], 'label':[], 'sfac':[], 'sign':[]}), \
+        ColumnDataSource({'x':[], 'y':[], 'IDs':[], 'value':[], 'shade':[], 'values':[], 'shades':[]}) )
+    p, lsets = makePlot(ncds, ecds, scds, modecds[0], modecds[1], modecds[2], solModule, modecds[3])
 
     return p, lsets, ncds, ecds, scds, modecds
@@ -1,7 +1,28 @@
-from bokeh.models import Div, Button, Spinner, Slider
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from scipy.linalg import eigh, eig_banded
+from scipy.linalg.lapack import dgbtrf, dgbtrs
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.linalg import eigsh, splu, spsolve_triangular, LinearOperator
 from utils import *
+import element
 import howto
 
+ENGINES = {'Dense (all modes)':'dense', 'Sparse (lowest modes)':'sparse', 'Banded (lowest modes)':'banded', \
+    'Re-solve (from previous modes)':'warm'}
+REDUCTIONS = {'None':None, 'Guyan (translations)':'guyan'}
+SENSITIVITY_PARAMETERS = {'None':None, "Young's modulus E":'E', 'Area A':'A', 'Inertia I':'I', 'Density rho':'rho'}
+#smallest MAC value for which a mode is identified with a mode of the previous solution
+MAC_THRESHOLD = 0.8
+#maximum number of mode shapes shipped to the browser for client-side rendering
+CLIENT_MAX_MODES = 50
+#worker threads of each session for model import, assembly, model checks and solutions.
+#The heavy numpy/scipy kernels release the GIL, so the bokeh event loop stays responsive,
+#and each session has its own threads, so that a long solution does not queue the tasks of other sessions.
+TASK_WORKERS_PER_SESSION = 2
+#number of master dofs condensed at a time by the Guyan reduction
+GUYAN_BLOCK = 64
+
 def printMessage(message, color, divSol):
     divSol.text = f'<br><p style="color:{color}"><b>{message}</b></p>'
 
@@ -9,215 +30,837 @@ def checkDanglingNodes(nset, elset):
     """
     Returns True if there are no dangling nodes, False otherwise
     """
-    ndofs = []
-    for node in nset.members:
-        ndofs.append(node.getDOFs())
-    n_unique = np.unique(ndofs)
-    eldofs = []
-    for element in elset.members:
-        eldofs.append(element.getEdof())
-    e_unique = np.unique(eldofs)
-    return np.array_equal(n_unique, e_unique)
+    #compared by nodes rather than dofs, since the released element end rotations are not node dofs
+    connected = {n for element in elset.members for n in (element.na, element.nb)}
+    return all(node in connected for node in nset.members)
+
+def findMechanismModes(Kfree, tol=1e-10):
+    """
+    Returns the mechanism (zero-energy) modes of the free stiffness block, one per column.
+    A pivot below tol of the LDL.T-like factorization of the unit-diagonal scaled matrix indicates a mechanism,
+    whose shape is recovered by back substitution.
+    """
+    Kfree = sp.csc_matrix(Kfree)
+    nf = Kfree.shape[0]
+    diag = Kfree.diagonal()
+    zeroDiag = np.abs(diag) <= tol*max(np.abs(diag).max(), 1.0)
+    modes = []
+    for i in np.flatnonzero(zeroDiag):
+        phi = np.zeros(nf)
+        phi[i] = 1.0
+        modes.append(phi)
+    scale = np.where(zeroDiag, 1.0, 1.0/np.sqrt(np.abs(np.where(zeroDiag, 1.0, diag))))
+    Ks = sp.diags(scale) @ Kfree @ sp.diags(scale) + sp.diags(zeroDiag.astype(float))
+    factorize = partial(splu, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.0, options=dict(SymmetricMode=True))
+    try:
+        lu = factorize(sp.csc_matrix(Ks))
+    except RuntimeError:
+        #SuperLU stops at an exactly zero pivot, a tiny shift keeps the pivots of the mechanisms nonzero but below tol
+        lu = factorize(sp.csc_matrix(Ks + 0.01*tol*sp.eye(nf)))
+    U = lu.U.tocsr()
+    pivots = U.diagonal()
+    small = np.flatnonzero(np.abs(pivots) <= tol)
+    if not small.size:
+        return np.column_stack(modes) if modes else np.zeros((nf,0))
+    #regularize the zero pivots, so that each null vector can be obtained from the leading block of U
+    Ureg = (U + sp.diags(np.where(np.abs(pivots) <= tol, 1.0, 0.0))).tocsr()
+    for i in small:
+        z = np.zeros(nf)
+        z[i] = -1.0
+        if i > 0:
+            z[:i] = spsolve_triangular(Ureg[:i,:i], U[:i,i].toarray().ravel(), lower=False)
+        modes.append(scale*z[lu.perm_c])
+    return np.column_stack(modes)
+
+def gatherConstraints(elset, supset):
+    """
+    Returns the constrained dofs (1-based) of a model: the supported dofs, and the dofs without elements,
+    e.g. node rotations released at all connected element ends
+    """
+    return np.union1d(supset.gatherConstraints(), elset.getUnconnectedDofs())
 
 def checkStiffnessSingularity(elset, supset):
     """
-    Returns True if the stiffness matrix is not singular, False otherwise
-    Also returns False if there are no free degrees of freedom.
+    Returns (True, []) if the stiffness matrix is not singular, otherwise (False, dofs),
+    where dofs lists the (1-based) degrees of freedom participating in the detected mechanisms.
+    Also returns (False, []) if there are no free degrees of freedom.
     """
-    eldofs = []
-    for element in elset.members:
-        eldofs.append(element.getEdof())
-    dofs = np.unique(eldofs)
-    bc = supset.gatherConstraints()
+    dofs = np.unique(elset.getModelEdof())
+    bc = gatherConstraints(elset, supset)
     free = np.setdiff1d(dofs, bc) - 1
-    if not free.any():
-        return False
-    Kfree = elset.getStiffnessMatrix()[np.ix_(free,free)]
-    kRank = np.linalg.matrix_rank(Kfree)
-    if kRank < min(Kfree.shape):
-        return False
-    return True
+    if not free.size:
+        return False, np.array([], dtype=np.int32)
+    modes = findMechanismModes(extractBlock(elset.getStiffnessMatrix(), free, free))
+    if not modes.shape[1]:
+        return True, np.array([], dtype=np.int32)
+    amplitude = np.max(np.abs(modes), axis=1)
+    involved = amplitude > 1e-6*amplitude.max()
+    return False, free[involved] + 1
+
+def bandLimits(band):
+    """
+    Returns the eigenvalue limits (lmin, lmax) of the frequency band = (fmin, fmax) [Hz], (0, inf) without a band
+    """
+    return (0.0, np.inf) if band is None else ((2*np.pi*band[0])**2, (2*np.pi*band[1])**2)
+
+def eigenpairsInBand(eigs, direct, n, nmodes, band):
+    """
+    Returns the lowest nmodes eigenpairs (L, X) within band, sorted by L, from eigs(k), which computes the
+    k eigenpairs nearest to the lower band limit. As some of them may lie below the band, k is doubled until
+    nmodes eigenpairs within the band are found or the band is exceeded. Problems too small for ARPACK (k >= n-1)
+    are solved with direct(), which returns all eigenpairs.
+    """
+    lmin, lmax = bandLimits(band)
+    k = min(nmodes, n)
+    while True:
+        D, X = direct() if k >= n - 1 else eigs(k)
+        s_order = np.argsort(D)
+        D, X = D[s_order], X[:,s_order]
+        inBand = (D >= lmin) & (D <= lmax)
+        if inBand.sum() >= nmodes or D[-1] > lmax or k >= n - 1:
+            return D[inBand][:nmodes], X[:,inBand][:,:nmodes]
+        k = min(2*k, n - 1)
+
+def eigenPartial(K, M, b, nmodes=10, band=None):
+    """
+    Solve the generalized eigenvalue problem |K-LM|X = 0 for the lowest nmodes eigenpairs with shift-invert Lanczos,
+    optionally only within band = (fmin, fmax) [Hz]. Returns L (nmodes) and the mass-normalized X (ndof x nmodes),
+    with zeros at the constrained dofs, like cfc.eigen.
+    """
+    nd = K.shape[0]
+    fdof = np.setdiff1d(np.arange(nd), b-1)
+    Kf = sp.csc_matrix(extractBlock(K, fdof, fdof))
+    Mf = sp.csc_matrix(extractBlock(M, fdof, fdof))
+    sigma = bandLimits(band)[0]
+    #ARPACK requires k < n-1, small problems are solved directly
+    L, X1 = eigenpairsInBand(lambda k: eigsh(Kf, k=k, M=Mf, sigma=sigma, which='LM'), \
+        lambda: eigh(Kf.toarray(), Mf.toarray()), fdof.size, nmodes, band)
+    X1 /= np.sqrt(np.einsum('ij,ij->j', X1, Mf@X1))
+    X = np.zeros((nd, L.shape[0]))
+    X[fdof,:] = X1
+    return L, X
+
+def eigenDiagonalMass(K, M, b, nmodes=None, band=None):
+    """
+    Solve |K-LM|X = 0 with a diagonal (lumped) M as the standard problem |D K D - L I|Y = 0, D = M^-1/2, X = D Y.
+    All eigenpairs if nmodes is None, otherwise the lowest nmodes as in eigenPartial.
+    """
+    nd = K.shape[0]
+    fdof = np.setdiff1d(np.arange(nd), b-1)
+    d = 1/np.sqrt(M.diagonal()[fdof])
+    Kf = extractBlock(K, fdof, fdof)
+    sigma = bandLimits(band)[0]
+    Kd = sp.csc_matrix(sp.diags(d) @ sp.csc_matrix(Kf) @ sp.diags(d))
+    L, Y = eigenpairsInBand(lambda k: eigsh(Kd, k=k, sigma=sigma, which='LM'), \
+        lambda: eigh(d[:,None]*toDense(Kf)*d[None,:]), fdof.size, fdof.size if nmodes is None else nmodes, band)
+    X1 = d[:,None]*Y
+    X = np.zeros((nd, L.shape[0]))
+    X[fdof,:] = X1
+    return L, X
+
+def eigenBanded(K, M, b, nmodes=10, band=None):
+    """
+    eigenPartial with K and M in banded storage, for dofs renumbered to a small bandwidth.
+    A lumped mass is solved directly with eig_banded, a consistent mass (which has no banded LAPACK driver)
+    with shift-invert Lanczos on a banded LU factorization of K - sigma M.
+    """
+    nd = K.shape[0]
+    fdof = np.setdiff1d(np.arange(nd), b-1)
+    Kf = sp.csr_matrix(extractBlock(K, fdof, fdof))
+    Mf = sp.csr_matrix(extractBlock(M, fdof, fdof))
+    lmin, lmax = bandLimits(band)
+    k = min(nmodes, fdof.size)
+    if isDiagonal(Mf):
+        d = 1/np.sqrt(Mf.diagonal())
+        Kd = sp.diags(d) @ Kf @ sp.diags(d)
+        if band is None:
+            L, Y = eig_banded(bandedStorage(Kd, bandwidth(Kd), 0), lower=True, select='i', select_range=(0, k-1))
+        else:
+            L, Y = eig_banded(bandedStorage(Kd, bandwidth(Kd), 0), lower=True, select='v', select_range=(lmin, lmax))
+        L, X1 = L[:k], d[:,None]*Y[:,:k]
+    else:
+        if k >= fdof.size - 1:
+            return eigenPartial(K, M, b, nmodes, band)
+        w = max(bandwidth(Kf), bandwidth(Mf))
+        lu, piv, info = dgbtrf(bandedStorage(Kf - lmin*Mf, w, w, w), w, w)
+        if info != 0:
+            raise np.linalg.LinAlgError("Banded factorization of the shifted stiffness matrix failed")
+        OPinv = LinearOperator(Kf.shape, matvec=lambda x: dgbtrs(lu, w, w, x, piv)[0], dtype=float)
+        L, X1 = eigenpairsInBand(lambda k: eigsh(Kf, k=k, M=Mf, sigma=lmin, which='LM', OPinv=OPinv), \
+            lambda: eigh(Kf.toarray(), Mf.toarray()), fdof.size, nmodes, band)
+        X1 /= np.sqrt(np.einsum('ij,ij->j', X1, Mf@X1))
+    X = np.zeros((nd, L.shape[0]))
+    X[fdof,:] = X1
+    return L, X
+
+def eigenWarmStart(K, M, b, X0, tol=1e-8, maxiter=10):
+    """
+    Solve |K-LM|X = 0 for the lowest X0.shape[1] eigenpairs by subspace iteration starting from X0,
+    e.g. the eigenvectors of a previous solution, whose signs are kept.
+    Returns None if the problem is too small or the iteration does not converge within maxiter iterations.
+    """
+    nd = K.shape[0]
+    fdof = np.setdiff1d(np.arange(nd), b-1)
+    X = X0[fdof,:]
+    k = X.shape[1]
+    p = k + min(k, 8)
+    if 2*p >= fdof.size:
+        return None
+    Kf = sp.csc_matrix(extractBlock(K, fdof, fdof))
+    Mf = sp.csc_matrix(extractBlock(M, fdof, fdof))
+    lu = splu(Kf)
+    Y = np.hstack((X, np.random.default_rng(0).standard_normal((fdof.size, p - k))))
+    L = np.zeros(p)
+    for _ in range(maxiter):
+        Z = lu.solve(Mf@Y)
+        #inverse iteration residual of the wanted Ritz pairs, K^-1 M y L - y vanishes for eigenpairs
+        if np.linalg.norm(Z[:,:k]*L[:k] - Y[:,:k]) < tol*np.linalg.norm(Y[:,:k]):
+            break
+        V = np.hstack((Z, lu.solve(Mf@Z)))
+        V /= np.linalg.norm(V, axis=0)
+        Q = np.linalg.qr(V)[0]
+        L, C = eigh(Q.T@(Kf@Q), Q.T@(Mf@Q))
+        Y = Q@C[:,:p]
+    else:
+        return None
+    L, X1 = L[:k], Y[:,:k]
+    X1 /= np.sqrt(np.einsum('ij,ij->j', X1, Mf@X1))
+    X1 *= np.where(np.einsum('ij,ij->j', X, Mf@X1) < 0, -1, 1)
+    X = np.zeros((nd, k))
+    X[fdof,:] = X1
+    return L, X
+
+def startingSubspace(previous, ndof, nmodes):
+    """
+    Returns the starting subspace (ndof x nmodes) for a warm-started solution from the eigenvectors of a previous solution.
+    Rows are truncated or padded with zeros if the number of dofs changed,
+    and random vectors are added if more modes than previously computed are requested.
+    """
+    X0 = previous[:ndof,:nmodes]
+    X0 = np.vstack((X0, np.zeros((ndof - X0.shape[0], X0.shape[1]))))
+    if X0.shape[1] < nmodes:
+        X0 = np.hstack((X0, np.random.default_rng(0).standard_normal((ndof, nmodes - X0.shape[1]))))
+    return X0
+
+def solveEigenproblem(K, M, b, engine='dense', nmodes=10, band=None, previous=None):
+    """
+    Dispatches the eigenvalue problem to the chosen engine, see ENGINES.
+    The 'dense' engine computes all modes and keeps those within band.
+    The 'warm' engine starts from previous (same dof layout as K) and falls back to 'sparse'
+    without a previous solution, with a band, or if it does not converge.
+    """
+    if engine == 'warm' and previous is not None and band is None:
+        solution = eigenWarmStart(K, M, b, startingSubspace(previous, K.shape[0], nmodes))
+        if solution is not None:
+            return solution
+    if engine == 'banded':
+        return eigenBanded(K, M, b, nmodes, band)
+    diagonal = isDiagonal(M)
+    if engine in ['sparse', 'warm']:
+        return eigenDiagonalMass(K, M, b, nmodes, band) if diagonal else eigenPartial(K, M, b, nmodes, band)
+    if diagonal:
+        return eigenDiagonalMass(K, M, b, band=band)
+    L, X = cfc.eigen(toDense(K), toDense(M), b)
+    lmin, lmax = bandLimits(band)
+    inBand = (L >= lmin) & (L <= lmax)
+    return L[inBand], X[:,inBand]
+
+def guyanMasters(elset, b):
+    """
+    Returns the default master dofs (1-based) of the Guyan reduction, i.e. the unconstrained translational dofs of the model
+    """
+    return np.setdiff1d(elset.getModelEdof()[:,[0,1,3,4]], b)
+
+def reduceGuyan(K, M, b, masters):
+    """
+    Guyan (static) condensation of |K-LM|X = 0 onto the master dofs (1-based), x = T x_m with T = [I; -S], S = Kss^-1 Ksm.
+    Kss is factored once, and S is formed for GUYAN_BLOCK masters at a time and condensed into Kr = Kmm - Ksm.T S and
+    Mr = Mmm - Msm.T S - S.T Msm + S.T Mss S, where S.T y = Ksm.T Kss^-1 y, so the dense slaves x masters S is never stored.
+    Returns the dense Kr, Mr and the 0-based masters, slaves, the factorization of Kss and Ksm for expandGuyan.
+    """
+    m = np.asarray(masters, dtype=np.int64) - 1
+    s = np.setdiff1d(np.arange(K.shape[0]), np.union1d(m, b-1))
+    K, M = sp.csr_matrix(K), sp.csr_matrix(M)
+    Kr, Mr = extractBlock(K, m, m).toarray(), extractBlock(M, m, m).toarray()
+    reduction = {'masters':m, 'slaves':s, 'lu':None, 'Ksm':None}
+    if s.size:
+        Ksm, Msm, Mss = sp.csc_matrix(extractBlock(K, s, m)), sp.csc_matrix(extractBlock(M, s, m)), extractBlock(M, s, s)
+        lu = splu(sp.csc_matrix(extractBlock(K, s, s)))
+        for j in range(0, m.size, GUYAN_BLOCK):
+            block = slice(j, j + GUYAN_BLOCK)
+            S = lu.solve(Ksm[:,block].toarray())
+            Kr[:,block] -= Ksm.T @ S
+            Mr[:,block] += Ksm.T @ lu.solve(Mss @ S - Msm[:,block].toarray()) - Msm.T @ S
+        reduction.update(lu=lu, Ksm=Ksm)
+    return (Kr + Kr.T)/2, (Mr + Mr.T)/2, reduction
+
+def expandGuyan(reduction, Xr, ndof):
+    """
+    Expands the reduced eigenvectors Xr (n_masters x n_modes) to all ndof dofs, X = T Xr, see reduceGuyan
+    """
+    X = np.zeros((ndof, Xr.shape[1]))
+    X[reduction['masters'],:] = Xr
+    if reduction['lu'] is not None and Xr.shape[1]:
+        X[reduction['slaves'],:] = -reduction['lu'].solve(np.asarray(reduction['Ksm'] @ Xr))
+    return X
+
+def solveGuyan(K, M, b, masters, engine='dense', nmodes=10, band=None, previous=None):
+    """
+    Solves the eigenvalue problem reduced onto the master dofs with the chosen engine, see reduceGuyan and solveEigenproblem
+    """
+    if not np.size(masters):
+        return np.zeros(0), np.zeros((K.shape[0], 0))
+    Kr, Mr, reduction = reduceGuyan(K, M, b, masters)
+    if previous is not None:
+        previous = previous[reduction['masters'],:]
+    evals, Xr = solveEigenproblem(Kr, Mr, np.zeros(0, dtype=int), engine, nmodes, band, previous)
+    return evals, expandGuyan(reduction, Xr, K.shape[0])
+
+def getSolverSettings(solModule):
+    """
+    Reads the eigensolver settings from the solver module widgets
+    """
+    fmin, fmax = solModule['fminWidget'].value, solModule['fmaxWidget'].value
+    band = None
+    if (fmin is not None) or (fmax is not None):
+        band = (fmin if fmin is not None else 0.0, fmax if fmax is not None else np.inf)
+    return {'engine':ENGINES[solModule['engineSelect'].value], 'nmodes':max(int(solModule['nModesWidget'].value or 1), 1), \
+        'band':band, 'reduction':REDUCTIONS[solModule['reductionSelect'].value], 'compare':0 in solModule['compareWidget'].active}
 
 def extractEigenvectors(elset, evecs):
     """
-    Builds a multidimensional array with size (n_elements x 6 x n_eigenvectors).
-    For each eigenvector and element nodal displacements/rotations
+    Builds a multidimensional array with size (n_mesh_elements x 6 x n_eigenvectors).
+    For each eigenvector and element of the mesh (see element.ElementSet.getMesh) nodal displacements/rotations
     [u1 v1 phi1 u2 v2 phi2].T
-    are reconstructed from the global solution using CALFEM function extract_eldisp.
+    are gathered from the global solution for all eigenvectors at once using the model edof.
     """
-    disp_extracted = np.zeros((elset.getSize(),6,evecs.shape[1]))
-    for i in range(evecs.shape[1]):
-        disp_extracted[:,:,i] = cfc.extract_eldisp(elset.getModelEdof(),evecs[:,i])
-    return disp_extracted
+    return evecs[elset.getModelEdof() - 1, :]
 
-def computeContinousDisplacement(elset, disp_extracted, sfac=None):
+def alignEigenvectors(X, dofs, targetDofs):
     """
-    Builds multidimensional arrays ex_cont, ey_cont with size (n_elements x 21 x n_eigenvectors)
-    and computed continuous displacements (in x- and y-directions, respectively)
-    at 21 points along the beam element from the global displacements/rotations.
-    For each eigenvector and element the corresponding displacements
-    [u1 u2 u3 ... u21].T and [v1 v2 v3 ... v21].T
-    are computed from element nodal values using CALFEM function beam2crd and put into the corresponding
-    column of ex_cont and ey_cont.
+    Rearranges the rows of the eigenvectors X, which belong to the dofs with the numbers dofs before any renumbering
+    (see element.ElementSet.getOriginalDofs), to the rows of the dofs targetDofs, e.g. to compare solutions
+    or warm-start a solution after the dofs were renumbered. Rows of dofs missing in X are zero.
     """
-    ex, ey = elset.getExEy()
-    nel = elset.getSize()
-    ex_cont = np.zeros((nel,21,disp_extracted.shape[2]))
-    ey_cont = np.zeros((nel,21,disp_extracted.shape[2]))
-    dx_max = float(np.max(ex))-float(np.min(ex))
-    dy_max = float(np.max(ey))-float(np.min(ey))
+    inverse = np.full(max(np.max(dofs, initial=0), np.max(targetDofs, initial=0)) + 1, -1)
+    inverse[dofs] = np.arange(dofs.size)
+    rows = inverse[targetDofs]
+    aligned = np.zeros((targetDofs.size, X.shape[1]))
+    aligned[rows >= 0] = X[rows[rows >= 0]]
+    return aligned
+
+def previousEigenvectors(previous, elset):
+    """
+    Returns the eigenvectors of the previous solution (or None) in the current dof layout of elset, for warm starts
+    """
+    if not (previous and ('eigenvectors' in previous)):
+        return None
+    return alignEigenvectors(previous['eigenvectors'], previous['dofs'], elset.getOriginalDofs(elset.ndof))
+
+def mac(phiA, phiB):
+    """
+    Modal Assurance Criterion of all pairs of the modes phiA (ndof x nA) and phiB (ndof x nB),
+    MAC_ij = (phiA_i.T phiB_j)^2 / ((phiA_i.T phiA_i)(phiB_j.T phiB_j)), computed with one matrix product.
+    Returns the MAC matrix (nA x nB), with values from 0 (orthogonal shapes) to 1 (identical shapes up to scaling).
+    """
+    return (phiA.T @ phiB)**2/np.outer(np.einsum('ij,ij->j', phiA, phiA), np.einsum('ij,ij->j', phiB, phiB))
+
+def matchModes(phiA, phiB):
+    """
+    Matches the modes phiB to the modes phiA one-to-one, maximizing the total MAC.
+    Returns (a, b, values): mode b[i] of phiB is matched to mode a[i] of phiA with the MAC value values[i].
+    """
+    macMatrix = mac(phiA, phiB)
+    a, b = linear_sum_assignment(-macMatrix)
+    return a, b, macMatrix[a, b]
+
+def identifyModes(solution, previous):
+    """
+    Numbers the modes consistently with the previous solution (or None): a mode matched with MAC >= MAC_THRESHOLD
+    keeps its previous number, the others get new numbers. The modes are compared on the common node dofs.
+    Stores the mode numbers in solution['identity'] and returns them.
+    """
+    n = solution['eigenvalues'].shape[0]
+    identity = np.arange(1, n+1)
+    if previous and ('identity' in previous):
+        nodal = ~solution['internal']
+        previousModes = alignEigenvectors(previous['eigenvectors'], previous['dofs'], solution['dofs'][nodal])
+        a, b, values = matchModes(previousModes, solution['eigenvectors'][nodal])
+        matched = values >= MAC_THRESHOLD
+        identity = np.zeros(n, dtype=int)
+        identity[b[matched]] = previous['identity'][a[matched]]
+        new = identity == 0
+        identity[new] = previous['identity'].max() + 1 + np.arange(np.count_nonzero(new))
+    solution['identity'] = identity
+    return identity
+
+def computeSensitivities(solution, modes=None, relative=False):
+    """
+    Returns the derivatives df/dp [Hz per unit] of the frequencies of the (0-based) modes, all by default,
+    with respect to p = E, A, I, rho of each element as {'E':..., 'A':..., 'I':..., 'rho':...} (n_elements x n_modes),
+    or the relative sensitivities p/f df/dp. dL/dp = phi_e.T (dKe/dp - L dMe/dp) phi_e, with dKe/dp from element.beam2dParts.
+    The mesh and the properties are those of the solved model (see solveModel), so later changes of the model do not matter.
+    """
+    modes = slice(None) if modes is None else modes
+    L = solution['eigenvalues'][modes]
+    phi = solution['a_extracted'][:,:,modes]
+    mesh = solution['mesh']
+    Ka, Kb, Mu = element.beam2dParts(mesh['ex'], mesh['ey'], mesh['massType'])
+    E, A, I, rho = [p[:,None] for p in mesh['properties']]
+    qa, qb, qm = [np.zeros((E.shape[0], L.shape[0])) for _ in range(3)]
+    for q, part in zip((qa, qb, qm), (Ka, Kb, Mu)):
+        np.add.at(q, mesh['members'], np.einsum('eim,eij,ejm->em', phi, part, phi))
+    dL = {'E':A*qa + I*qb, 'A':E*qa - L*rho*qm, 'I':E*qb, 'rho':-L*A*qm}
+    f = np.sqrt(L)/(2*np.pi)
+    if relative:
+        props = {'E':E, 'A':A, 'I':I, 'rho':rho}
+        return {p:props[p]*d/(8*np.pi**2*f**2) for p, d in dL.items()}
+    return {p:d/(8*np.pi**2*f) for p, d in dL.items()}
+
+def computeInterpolationOperators(elset, npoints=21):
+    """
+    Precomputes the undeformed coordinates x0, y0 (n_mesh_elements x npoints) and the operators Nx, Ny
+    (n_mesh_elements x npoints x 6), which map the element nodal values in global coordinates to the displacements
+    at npoints points along the element with the shape functions of beam2crd.
+    """
+    ex, ey = elset.getMeshExEy()
+    dx, dy = ex[:,1] - ex[:,0], ey[:,1] - ey[:,0]
+    L = np.hypot(dx, dy)[:,None]
+    c, s = (dx/L[:,0])[:,None], (dy/L[:,0])[:,None]
+    xi = np.linspace(0, 1, npoints)[None,:]
+    x0 = ex[:,[0]] + c*L*xi
+    y0 = ey[:,[0]] + s*L*xi
+    #shape functions for local axial (Nu) and transverse (Nv) displacement w.r.t. local dofs
+    zero = np.zeros((L.shape[0], npoints))
+    Nu = np.stack((1 - xi + zero, zero, zero, xi + zero, zero, zero), axis=2)
+    Nv = np.stack((zero, 1 - 3*xi**2 + 2*xi**3 + zero, L*(xi - 2*xi**2 + xi**3), \
+                    zero, 3*xi**2 - 2*xi**3 + zero, L*(xi**3 - xi**2)), axis=2)
+    #local dofs from global dofs: [c s 0; -s c 0; 0 0 1] at both nodes
+    G = np.zeros((L.shape[0],6,6))
+    for k in (0,3):
+        G[:,k,k], G[:,k,k+1], G[:,k+1,k], G[:,k+1,k+1], G[:,k+2,k+2] = c[:,0], s[:,0], -s[:,0], c[:,0], 1.0
+    Nx = (c[:,:,None]*Nu - s[:,:,None]*Nv) @ G
+    Ny = (s[:,:,None]*Nu + c[:,:,None]*Nv) @ G
+    return x0, y0, Nx, Ny
+
+def computeScaleFactor(operators, disp_extracted):
+    """
+    Returns the default scale factor, which makes the largest nodal displacement
+    equal to the largest dimension of the model
+    """
+    x0, y0, _, _ = operators
+    dx_max = float(np.max(x0))-float(np.min(x0))
+    dy_max = float(np.max(y0))-float(np.min(y0))
     dl_max = max(dx_max, dy_max)
     ed_max = float(np.max(np.max(np.abs(disp_extracted))))
+    return 1*dl_max/ed_max
+
+def computeContinousDisplacement(elset, disp_extracted, sfac=None, operators=None, eigenmode=None):
+    """
+    Builds multidimensional arrays ex_cont, ey_cont with size (n_mesh_elements x 21 x n_eigenvectors)
+    with the deformed coordinates at 21 points along the beam elements.
+    Continuous displacements (in x- and y-directions, respectively) are obtained for all eigenvectors
+    with a single batched matrix product of the precomputed interpolation operators and
+    the element nodal values. If eigenmode is given, only that mode is computed (n_eigenvectors = 1).
+    """
+    if operators is None:
+        operators = computeInterpolationOperators(elset)
+    x0, y0, Nx, Ny = operators
     if not sfac:
-        sfac = 1*dl_max/ed_max
-    for i in range(disp_extracted.shape[2]):
-        ex_cont[:,:,i], ey_cont[:,:,i] = cfc.beam2crd(np.array(ex), np.array(ey), disp_extracted[:,:,i], sfac)
+        sfac = computeScaleFactor(operators, disp_extracted)
+    if eigenmode is not None:
+        disp_extracted = disp_extracted[:,:,eigenmode-1:eigenmode]
+    ex_cont = x0[:,:,None] + sfac*(Nx @ disp_extracted)
+    ey_cont = y0[:,:,None] + sfac*(Ny @ disp_extracted)
     return ex_cont, ey_cont, sfac
 
+def getModeShape(solution, eigenmode):
+    """
+    Returns the unscaled interpolated displacement field (ux, uy), each with size (n_mesh_elements x 21),
+    of the given eigenmode. The field is computed on first request and cached in the solution,
+    so that changing the scale or the sense of the mode does not require any recomputation.
+    """
+    fields = solution['fields']
+    if eigenmode not in fields:
+        _, _, Nx, Ny = solution['operators']
+        ed = solution['a_extracted'][:,:,eigenmode-1]
+        fields[eigenmode] = (np.einsum('epj,ej->ep', Nx, ed), np.einsum('epj,ej->ep', Ny, ed))
+    return fields[eigenmode]
+
+def getDeformedShape(solution, eigenmode):
+    """
+    Returns the deformed coordinates (exc, eyc), each with size (n_mesh_elements x 21), of the given eigenmode.
+    Deformed shape = undeformed shape + sign * scale * sfac * (interpolated displacement)
+    """
+    x0, y0, _, _ = solution['operators']
+    ux, uy = getModeShape(solution, eigenmode)
+    factor = solution['sign'] * solution['scale'] * solution['sfac']
+    return x0 + factor*ux, y0 + factor*uy
+
+def flattenLines(lines, separator=np.nan):
+    """
+    Flattens an array of polylines with size (n_elements x n_points) to one contiguous float32 array,
+    with the element polylines separated by the separator value (NaN breaks the line in the plot).
+    """
+    sep = np.full((lines.shape[0],1), separator)
+    return np.hstack((lines, sep)).ravel().astype(np.float32)
+
+def getModeLabel(solution, eigenmode):
+    """
+    Returns the frequency label of the given eigenmode, with its mode number if it differs from the position
+    (i.e. the mode was identified with a differently ordered mode of a previous solution, see identifyModes)
+    """
+    label = f"f = {np.sqrt(solution['eigenvalues'][eigenmode-1])/(2*np.pi):.2f} Hz"
+    identity = solution.get('identity')
+    if (identity is not None) and (identity[eigenmode-1] != eigenmode):
+        label += f" (tracked as mode {identity[eigenmode-1]})"
+    return label
+
 def updateSolutionData(solModule, modeCDS, eigenmode):
-    exc = solModule['solution']['exc']
-    eyc = solModule['solution']['eyc']
-    nel = exc.shape[0]
-    exclist, eyclist = [], []
-    for i in range(nel):
-        exclist.append(exc[i,:,eigenmode-1])
-        eyclist.append(eyc[i,:,eigenmode-1])
-    modeCDS[0].data = {'x':exclist, 'y':eyclist}
+    exc, eyc = getDeformedShape(solModule['solution'], eigenmode)
+    modeCDS[0].data = {'x':flattenLines(exc), 'y':flattenLines(eyc)}
     modeCDS[1].visible = True
-    modeCDS[1].text=f"f = {np.sqrt(solModule['solution']['eigenvalues'][eigenmode-1])/(2*np.pi):.2f} Hz"
+    modeCDS[1].text = getModeLabel(solModule['solution'], eigenmode)
+
+def shipSolutionData(solModule, modeCDS, nmodes, eigenmode=1):
+    """
+    Sends the undeformed geometry and the unscaled interpolated displacement fields of the first nmodes modes
+    to the browser once, as flat NaN-separated float32 typed arrays (one row per mode in modeCDS[2]).
+    Mode selection, scaling and flipping are then done client-side by the CustomJS callbacks from plot.makePlot.
+    """
+    solution = solModule['solution']
+    x0, y0, Nx, Ny = solution['operators']
+    ed = solution['a_extracted'][:,:,:nmodes]
+    ux = [flattenLines(u, 0.0) for u in np.einsum('epj,ejm->mep', Nx, ed)]
+    uy = [flattenLines(u, 0.0) for u in np.einsum('epj,ejm->mep', Ny, ed)]
+    freq = np.sqrt(solution['eigenvalues'][:nmodes])/(2*np.pi)
+    labels = [getModeLabel(solution, m) for m in range(1, nmodes+1)]
+    modeCDS[2].data = {'ux':ux, 'uy':uy, 'freq':freq, 'label':labels, 'sfac':np.full(nmodes, solution['sfac']), \
+        'sign':np.ones(nmodes)}
+    exc, eyc = getDeformedShape(solution, eigenmode)
+    modeCDS[0].data = {'x':flattenLines(exc), 'y':flattenLines(eyc), 'x0':flattenLines(x0), 'y0':flattenLines(y0)}
+    modeCDS[1].visible = True
+    modeCDS[1].text = labels[eigenmode-1]
+
+def updateSensitivityData(solModule, modeCDS, eigenmode):
+    """
+    Colors the elements by their relative sensitivity (p/f)*df/dp to the property chosen in sensitivitySelect,
+    scaled to the largest magnitude over the elements. With client-side rendering, the values of all shipped modes
+    are sent at once (mode selection is then done by the CustomJS callbacks), otherwise only those of the given eigenmode.
+    """
+    parameter = SENSITIVITY_PARAMETERS[solModule['sensitivitySelect'].value]
+    if parameter is None or not solModule['solution']:
+        clearSensitivityData(modeCDS)
+        return
+    solution = solModule['solution']
+    elset = solution['elset']
+    if solModule['clientRendering']:
+        modes, m = np.arange(min(solution['eigenvalues'].shape[0], CLIENT_MAX_MODES)), eigenmode-1
+    else:
+        modes, m = np.array([eigenmode-1]), 0
+    values = computeSensitivities(solution, modes, relative=True)[parameter]
+    scale = np.max(np.abs(values), axis=0)
+    shades = values/np.where(scale > 0, scale, 1)
+    ex, ey = elset.getExEy()
+    modeCDS[3].data = {'x':ex, 'y':ey, 'IDs':elset.getIDs(), 'value':values[:,m], 'shade':shades[:,m], \
+        'values':list(values), 'shades':list(shades)}
+
+def clearSensitivityData(modeCDS):
+    modeCDS[3].data = {'x':[], 'y':[], 'IDs':[], 'value':[], 'shade':[], 'values':[], 'shades':[]}
 
 def clearModeCDS(modeCDS):
     modeCDS[0].data = {'x':[], 'y':[]}
     modeCDS[1].visible = False
     modeCDS[1].text=""
+    modeCDS[2].data = {'ux':[], 'uy':[], 'freq':[], 'label':[], 'sfac':[], 'sign':[]}
+    clearSensitivityData(modeCDS)
+
+def checkModel(nset, elset, supset):
+    """
+    Checks whether the eigenvalue problem of the model can be solved.
+    Returns (ok, message, nReady), where nReady is the number of completed model definition steps.
+    """
+    if not nset.members:
+        return False, "No nodes were defined. Add model nodes", 0
+    if not elset.members:
+        return False, "No elements were defined. Add elements", 1
+    if not checkDanglingNodes(nset, elset):
+        return False, "There are free nodes (not associated with any element). Remove them or add elements.", 0
+    if not supset.members:
+        return False, "No supports were defined. Add supports and try again", 2
+    regular, mechanismDofs = checkStiffnessSingularity(elset, supset)
+    if not regular:
+        mechanismNodes = nset.getNodeNamesWithDOFs(mechanismDofs)
+        if mechanismNodes:
+            return False, f"Stiffness matrix singular. Mechanism involving nodes {', '.join(mechanismNodes)}. Check boundary conditions", 2
+        return False, "Stiffness matrix singular. Check boundary conditions", 2
+    return True, "Model check OK. Click Solve to proceed", 4
+
+def solveModel(elset, supset, engine='dense', nmodes=10, band=None, previous=None, reduction=None, masters=None, compare=False):
+    """
+    Solves the eigenvalue problem of an assembled model and prepares the mode shape reconstruction.
+    previous holds eigenvectors for the 'warm' engine (see previousEigenvectors), reduction='guyan' condenses the problem
+    onto the master dofs (1-based, by default the translational dofs, see guyanMasters),
+    and compare=True computes the resulting frequency errors (see reductionError).
+    Returns the solution dictionary, or None if no eigenmodes were found in the frequency band.
+    """
+    bc = gatherConstraints(elset, supset)
+    K, M = elset.getStiffnessMatrix(), elset.getMassMatrix()
+    if reduction == 'guyan':
+        masters = guyanMasters(elset, bc) if masters is None else np.setdiff1d(masters, bc)
+        evals, evecs = solveGuyan(K, M, bc, masters, engine, nmodes, band, previous)
+    else:
+        evals, evecs = solveEigenproblem(K, M, bc, engine, nmodes, band, previous)
+    if not evals.shape[0]:
+        return None
+    a_extracted = extractEigenvectors(elset, evecs)
+    operators = computeInterpolationOperators(elset)
+    sfac = computeScaleFactor(operators, a_extracted)
+    solution = {'eigenvalues':evals, 'eigenvectors':evecs, 'dofs':elset.getOriginalDofs(evecs.shape[0]), \
+        'internal':np.isin(np.arange(1, evecs.shape[0]+1), elset.getInternalDofs()), 'a_extracted':a_extracted, \
+        'operators':operators, 'fields':{}, 'sfac':sfac, 'scale':1, 'sign':1, 'mesh':getMeshData(elset)}
+    if reduction == 'guyan':
+        solution['reduction'] = {'method':reduction, 'masters':masters.size, 'band':band}
+        if compare:
+            solution['reduction']['error'] = reductionError(elset, supset, solution)
+    return solution
+
+def getMeshData(elset):
+    """
+    Returns the geometry of the mesh, the element of the set each mesh element belongs to and the element properties
+    of an element set, copied for the sensitivities of its solution, since re-meshing rewrites the elements in place
+    """
+    ex, ey = elset.getMeshExEy()
+    return {'ex':ex, 'ey':ey, 'members':elset.getMeshMembers(), 'properties':np.array(elset.getProperties(), dtype=float).reshape(4,-1), \
+        'massType':elset.massType}
+
+def reductionError(elset, supset, solution):
+    """
+    Solves the full eigenvalue problem of the model for as many lowest modes (within the same frequency band) as the
+    reduced solution holds, with the 'sparse' engine, and returns the relative errors f_reduced/f_full - 1
+    of the reduced frequencies in ascending order. The errors are positive, since the reduced frequencies are upper bounds.
+    """
+    bc = gatherConstraints(elset, supset)
+    reduced = solution['eigenvalues']
+    full, _ = solveEigenproblem(elset.getStiffnessMatrix(), elset.getMassMatrix(), bc, 'sparse', reduced.shape[0], \
+        solution['reduction']['band'])
+    n = min(reduced.shape[0], full.shape[0])
+    return np.sqrt(reduced[:n]/full[:n]) - 1
+
+"""
+Background tasks
+"""
+def submitTask(solModule, kind, task, onDone, message):
+    """
+    Runs task() in the worker pool of the session and applies onDone(result) in a next tick callback of the document,
+    so that heavy steps do not block the bokeh event loop. A new task of the same kind supersedes the previous one,
+    which is cancelled if it has not started yet, or whose result is discarded otherwise.
+    Without a document (e.g. when the modules are used from scripts) the task is run synchronously.
+    """
+    doc = solModule.get('doc')
+    if doc is None:
+        onDone(task())
+        return
+    cancelTask(solModule, kind)
+    token = object()
+    future = solModule['workers'].submit(task)
+    solModule['tasks'][kind] = (token, future)
+    printMessage(message, "gray", solModule['divSolver'])
+    enableAndShow(solModule['cancelButton'])
+    future.add_done_callback(lambda future: doc.add_next_tick_callback( \
+        partial(finishTask, solModule=solModule, kind=kind, token=token, future=future, onDone=onDone)))
+
+def finishTask(solModule, kind, token, future, onDone):
+    """
+    Applies the result of a finished background task, unless the task was superseded or cancelled
+    """
+    if solModule['tasks'].get(kind, (None, None))[0] is not token:
+        return
+    del solModule['tasks'][kind]
+    if not solModule['tasks']:
+        disableAndHide(solModule['cancelButton'])
+    if future.exception() is not None:
+        printMessage(f"Error: {future.exception()}", "red", solModule['divSolver'])
+        if solModule['solveButton'].visible:
+            solModule['solveButton'].disabled = False
+        return
+    onDone(future.result())
+
+def cancelTask(solModule, kind):
+    """
+    Cancels the background task of the given kind. A task which is already running cannot be interrupted,
+    but its result is discarded.
+    """
+    _, future = solModule['tasks'].pop(kind, (None, None))
+    if future is not None:
+        future.cancel()
+    if not solModule['tasks']:
+        disableAndHide(solModule['cancelButton'])
+
+def createTaskWorkers(doc):
+    """
+    Returns the worker pool of the session of doc, which is shut down when the session is destroyed
+    """
+    workers = ThreadPoolExecutor(max_workers=TASK_WORKERS_PER_SESSION, thread_name_prefix='eigenHelper')
+    doc.on_session_destroyed(lambda context: workers.shutdown(wait=False, cancel_futures=True))
+    return workers
 
 """
 Solver module callbacks
 """
+def hideSolution(solModule, modeCDS):
+    """
+    Hides the solve button and the mode widgets and clears the shown mode shape, e.g. when the model changed
+    """
+    for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'], \
+        solModule['sensitivitySelect'] ]:
+        disableAndHide(widget)
+    clearModeCDS(modeCDS)
+
+def failModelCheck(solModule, htModule, modeCDS, message, nReady):
+    cancelTask(solModule, 'check')
+    cancelTask(solModule, 'solve')
+    hideSolution(solModule, modeCDS)
+    printMessage(message, "red", solModule['divSolver'])
+    htModule['colors'] = ['black'] + nReady*['green'] + (5-nReady)*['red']
+    howto.updateHowtoDiv(htModule)
+
 def checkModelOnClick(nModule, elModule, bcModule, solModule, htModule, modeCDS):
     if (not nModule['nset'].members) or (not nModule['assignDOFsButton'].disabled):
-        for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
-            disableAndHide(widget)
-        clearModeCDS(modeCDS)
-        printMessage("No nodes were defined or degrees of freedom have not been assigned yet. Add model nodes and press Define Elements button", "red", solModule['divSolver'])
-        htModule['colors'] = ['black'] + 5*['red']
-        howto.updateHowtoDiv(htModule)
+        failModelCheck(solModule, htModule, modeCDS, "No nodes were defined or degrees of freedom have not been assigned yet. Add model nodes and press Define Elements button", 0)
         return
     if (not elModule['eset'].members) or (not elModule['assembleButton'].disabled):
-        for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
-            disableAndHide(widget)
-        clearModeCDS(modeCDS)
-        printMessage("No elements were defined or global matrices have not been assembled yet. Add elements and press Define Supports button", "red", solModule['divSolver'])
-        htModule['colors'] = ['black'] + ['green'] + 4*['red']
-        howto.updateHowtoDiv(htModule)
-        return
-    if not checkDanglingNodes(nModule['nset'], elModule['eset']):
-        for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
-            disableAndHide(widget)
-        clearModeCDS(modeCDS)
-        printMessage("There are free nodes (not associated with any element). Remove them or add elements.", "red", solModule['divSolver'])
-        htModule['colors'] = ['black'] + 5*['red']
-        howto.updateHowtoDiv(htModule)
+        failModelCheck(solModule, htModule, modeCDS, "No elements were defined or global matrices have not been assembled yet. Add elements and press Define Supports button", 1)
         return
-    if not bcModule['sset'].members:
-        for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
-            disableAndHide(widget)
-        clearModeCDS(modeCDS)
-        printMessage("No supports were defined. Add supports and try again", "red", solModule['divSolver'])
-        htModule['colors'] = ['black'] + 2*['green'] + 3*['red']
-        howto.updateHowtoDiv(htModule)
+    hideSolution(solModule, modeCDS)
+    cancelTask(solModule, 'solve')
+    views = [nModule['nset'].snapshot(), elModule['eset'].snapshot(), bcModule['sset'].snapshot()]
+    submitTask(solModule, 'check', partial(checkModel, *views), partial(finishModelCheck, views=views, nModule=nModule, \
+        elModule=elModule, bcModule=bcModule, solModule=solModule, htModule=htModule, modeCDS=modeCDS), "Checking model\u2026")
+
+def finishModelCheck(result, views, nModule, elModule, bcModule, solModule, htModule, modeCDS):
+    ok, message, nReady = result
+    if not all(entitySet.matchesSnapshot(view) for entitySet, view in zip([nModule['nset'], elModule['eset'], bcModule['sset']], views)):
+        failModelCheck(solModule, htModule, modeCDS, "The model changed during the check. Click Check Model again", nReady)
         return
-    if not checkStiffnessSingularity(elModule['eset'], bcModule['sset']):
-        for widget in [solModule['solveButton'], solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
-            disableAndHide(widget)
-        clearModeCDS(modeCDS)
-        printMessage("Stiffness matrix singular. Check boundary conditions", "red", solModule['divSolver'])
-        htModule['colors'] = ['black'] + 2*['green'] + 3*['red']
-        howto.updateHowtoDiv(htModule)
+    if not ok:
+        failModelCheck(solModule, htModule, modeCDS, message, nReady)
         return
-    printMessage("Model check OK. Click Solve to proceed", "green", solModule['divSolver'])
+    printMessage(message, "green", solModule['divSolver'])
     enableAndShow(solModule['solveButton'])
     htModule['colors'] = ['black'] + 4*['green'] + ['red']
     howto.updateHowtoDiv(htModule)
-    for widget in [solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'] ]:
+    for widget in [solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'], solModule['sensitivitySelect'] ]:
         disableAndHide(widget)
     clearModeCDS(modeCDS)
     return
 
 
 def solveOnClick(elModule, bcModule, solModule, htModule, modeCDS):
-    K = elModule['eset'].getStiffnessMatrix()
-    M = elModule['eset'].getMassMatrix()
-    bc = bcModule['sset'].gatherConstraints()
-    #solve eigenvalue problem
-    ddofs = elModule['eset'].ddofs
-    if ddofs.any():
-        #dangling nodes need to be removed for the solution
-        remainingDofs = np.setdiff1d(np.arange(elModule['eset'].ndof), ddofs - 1)
-        Krem = K[np.ix_(remainingDofs,remainingDofs)]
-        Mrem = M[np.ix_(remainingDofs, remainingDofs)]
-        bcrem = np.copy(bc)
-        for dof in ddofs:
-            mask = np.where(bc > dof)
-            bcrem[mask] -= 1
-        evals, evecs = cfc.eigen(Krem,Mrem,bcrem)
-        #after solution add zeros where the dangling nodes were to make CALFEM functions work
-        for dof in ddofs:
-            evecs = np.insert(evecs, dof-1, 0, axis=0)
-    else:
-        evals, evecs = cfc.eigen(K,M,bc)
-    a_extracted = extractEigenvectors(elModule['eset'], evecs)
-    exc, eyc, sfac = computeContinousDisplacement(elModule['eset'], a_extracted)
-    solution = {'eigenvalues':evals, 'eigenvectors':evecs, 'a_extracted':a_extracted, 'exc':exc, 'eyc':eyc, \
-        'sfac':sfac}
+    solModule['solveButton'].disabled = True
+    views = [elModule['eset'].snapshot(), bcModule['sset'].snapshot()]
+    previous = previousEigenvectors(solModule['solution'], views[0])
+    submitTask(solModule, 'solve', partial(solveModel, *views, **getSolverSettings(solModule), previous=previous), \
+        partial(finishSolve, views=views, elModule=elModule, bcModule=bcModule, solModule=solModule, htModule=htModule, modeCDS=modeCDS), "Solving\u2026")
+
+def finishSolve(solution, views, elModule, bcModule, solModule, htModule, modeCDS):
+    if not (elModule['eset'].matchesSnapshot(views[0]) and bcModule['sset'].matchesSnapshot(views[1])):
+        printMessage("The model changed during the solution. Click Check Model again", "red", solModule['divSolver'])
+        return
+    if solution is None:
+        solModule['solveButton'].disabled = False
+        printMessage("No eigenmodes found in the specified frequency band", "red", solModule['divSolver'])
+        return
+    #the solved element set is kept for the sensitivity overlay
+    solution['elset'] = views[0]
+    previous = solModule['solution']
+    identifyModes(solution, previous)
     solModule['solution'] = solution
-    #show the first eigenmode directly
-    updateSolutionData(solModule, modeCDS, eigenmode=1)
+    nmodes = solution['eigenvalues'].shape[0]
+    if solModule['clientRendering']:
+        nmodes = min(nmodes, CLIENT_MAX_MODES)
+    #keep showing the mode shown before the change if it was identified in the new solution, otherwise the first mode
+    eigenmode = 1
+    shown = solModule['modeSpinner'].value
+    if previous and ('identity' in previous) and (shown <= previous['identity'].shape[0]):
+        found = np.flatnonzero(solution['identity'][:nmodes] == previous['identity'][shown-1])
+        eigenmode = found[0] + 1 if found.size else 1
+    if solModule['clientRendering']:
+        shipSolutionData(solModule, modeCDS, nmodes, eigenmode)
+    else:
+        updateSolutionData(solModule, modeCDS, eigenmode)
+    message = f"Found {solution['eigenvalues'].shape[0]} eigenmodes"
+    if 'reduction' in solution:
+        message += f" with the Guyan reduction to {solution['reduction']['masters']} dofs"
+        if 'error' in solution['reduction']:
+            message += f"<br>max frequency error {np.max(solution['reduction']['error'], initial=0):.2%} vs the full solution"
+    printMessage(message, "green", solModule['divSolver'])
     disableAndHide(solModule['solveButton'])
-    for widget in [solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton']]:
+    for widget in [solModule['modeSpinner'], solModule['scaleSlider'], solModule['flipButton'], solModule['sensitivitySelect']]:
         enableAndShow(widget)
-    solModule['modeSpinner'].value = 1
-    solModule['modeSpinner'].high = evals.shape[0]
+    solModule['modeSpinner'].high = nmodes
+    solModule['modeSpinner'].value = eigenmode
+    updateSensitivityData(solModule, modeCDS, eigenmode)
     solModule['scaleSlider'].value = 1
     htModule['colors'][5] = 'green'
     howto.updateHowtoDiv(htModule)
 
+def clearSolution(solModule):
+    """
+    Forgets the previous solution when the dofs are assigned anew, so that the modes of a different model
+    are neither tracked (see identifyModes) nor used to warm-start a solution
+    """
+    solModule['solution'] = {}
+
 def changeEigenmode(attr, old, new, solModule, modeCDS):
     updateSolutionData(solModule, modeCDS, new)
+    updateSensitivityData(solModule, modeCDS, new)
 
-def changeScale(attr, old, new, elModule, solModule, modeCDS):
-    sfac = solModule['solution']['sfac'] * new
-    exc, eyc, _ = computeContinousDisplacement(elModule['eset'], solModule['solution']['a_extracted'], \
-        sfac)
-    solModule['solution']['exc'] = exc
-    solModule['solution']['eyc'] = eyc
+def changeSensitivity(attr, old, new, solModule, modeCDS):
+    updateSensitivityData(solModule, modeCDS, solModule['modeSpinner'].value)
+
+def changeScale(attr, old, new, solModule, modeCDS):
+    solModule['solution']['scale'] = new
     updateSolutionData(solModule, modeCDS, solModule['modeSpinner'].value)
 
-def flip(elModule, solModule, modeCDS):
-    solModule['solution']['eigenvectors'] = np.negative(solModule['solution']['eigenvectors'])
-    a_extracted = extractEigenvectors(elModule['eset'], solModule['solution']['eigenvectors'])
-    sfac = solModule['solution']['sfac'] * solModule['scaleSlider'].value
-    exc, eyc, _ = computeContinousDisplacement(elModule['eset'], a_extracted, sfac)
-    solModule['solution']['a_extracted'] = a_extracted
-    solModule['solution']['exc'] = exc
-    solModule['solution']['eyc'] = eyc
+def flip(solModule, modeCDS):
+    solModule['solution']['sign'] = -solModule['solution']['sign']
     updateSolutionData(solModule, modeCDS, solModule['modeSpinner'].value)
 
+def cancelOnClick(solModule):
+    for kind in list(solModule['tasks'].keys()):
+        cancelTask(solModule, kind)
+    printMessage("Cancelled", "red", solModule['divSolver'])
+    if solModule['solveButton'].visible:
+        solModule['solveButton'].disabled = False
+
 
 """
 Solver module layout
 """
-def createSolverLayout(debug=False):
+def createSolverLayout(debug=False, clientRendering=False, doc=None):
+    from bokeh.models import Div, Button, Spinner, Slider, Select, NumericInput, CheckboxGroup
     checkModelButton = Button(label="Check Model", button_type="success", width=100, disabled=False)
     solveButton = Button(label="Solve", button_type="success", width=100, disabled=True, visible=False)
     modeSpinner = Spinner(title="Eigenvalue", low=1, high=10, step=1, value=1, mode='int', width=75, visible=False, disabled=True)
     scaleSlider = Slider(start=0.01, end=3, value=1, step=0.01, title="Scale", disabled=True, visible=False, show_value=False)
     flipButton = Button(label="Flip", button_type="default", width=75, disabled=True, visible=False)
+    cancelButton = Button(label="Cancel", button_type="warning", width=75, disabled=True, visible=False)
+    engineSelect = Select(title="Eigensolver:", options=list(ENGINES.keys()), value='Dense (all modes)', width=200)
+    nModesWidget = NumericInput(value=10, low=1, title="Modes (all but dense):", mode='int', width=140)
+    reductionSelect = Select(title="Model reduction:", options=list(REDUCTIONS.keys()), value='None', width=150)
+    compareWidget = CheckboxGroup(labels=['Compare with full solution'], active=[], width=200)
+    fminWidget = NumericInput(value=None, low=0, title="f min [Hz]:", mode='float', width=75)
+    fmaxWidget = NumericInput(value=None, low=0, title="f max [Hz]:", mode='float', width=75)
+    sensitivitySelect = Select(title="Sensitivity overlay:", options=list(SENSITIVITY_PARAMETERS.keys()), value='None', width=150, \
+        disabled=True, visible=False)
     divSolver = Div(text= "", width=500, height=75)
     solution = {}
 
-    solverLayoutDict = {'checkModelButton': checkModelButton, 'solveButton':solveButton, \
+    solverLayoutDict = {'checkModelButton': checkModelButton, 'solveButton':solveButton, 'cancelButton':cancelButton, \
         'modeSpinner':modeSpinner,  'scaleSlider':scaleSlider, 'flipButton':flipButton, \
-        'divSolver':divSolver, 'solution':solution}
+        'engineSelect':engineSelect, 'nModesWidget':nModesWidget, 'reductionSelect':reductionSelect, 'compareWidget':compareWidget, 'fminWidget':fminWidget, 'fmaxWidget':fmaxWidget, \
+        'sensitivitySelect':sensitivitySelect, 'divSolver':divSolver, 'solution':solution, 'clientRendering':clientRendering, 'doc':doc, 'tasks':{}, \
+        'workers':createTaskWorkers(doc) if doc is not None else None}
     return solverLayoutDict
 
@@ -0,0 +1,211 @@
+"""
+Parameter sweeps of eigenHelper models.
+Sweeps one property of one or more elements over a range of values and tabulates the natural frequencies,
+with the modes tracked from point to point. The model is assembled once, and at each point only the matrices
+of the swept elements are updated in the data arrays of the global matrices.
+
+Usage:
+    python eigenHelper/sweep.py model.json -e 3 4 -p I --start 1e-5 --stop 1e-4 -n 100 -o sweep.csv --workers 4
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from utils import *
+import element
+import solver
+import engine
+import batch
+
+SWEEP_PARAMETERS = ['E', 'A', 'I', 'rho']
+#sweep context of the worker processes, set once per worker by initSweepWorker
+WORKER_CONTEXT = {}
+
+def scatterPositions(A, edof):
+    """
+    Returns the positions of the entries of the element matrices with the topology edof (1-based dofs, n_elements x 6)
+    in the data array of the global matrix A (CSR with sorted indices), or in the flattened A if A is dense,
+    in the order of assembleGlobal
+    """
+    rows, cols = element.edofEntries(edof)
+    ndof = A.shape[0]
+    if not sp.issparse(A):
+        return rows*ndof + cols
+    keys = np.repeat(np.arange(ndof, dtype=np.int64), np.diff(A.indptr))*ndof + A.indices
+    return np.searchsorted(keys, rows*ndof + cols)
+
+def withPattern(A, edof):
+    """
+    Returns A as CSR with sorted indices, which explicitly stores (possibly zero) entries at all element dofs edof,
+    so that the sweep updates never change the sparsity pattern
+    """
+    rows, cols = element.edofEntries(edof)
+    A = A.tocoo()
+    A = sp.coo_matrix((np.concatenate((A.data, np.zeros(rows.size))), (np.concatenate((A.row, rows)), np.concatenate((A.col, cols)))), \
+        shape=A.shape).tocsr()
+    A.sort_indices()
+    return A
+
+def createSweepContext(model, elementIDs, parameter, engineName='sparse', nmodes=10):
+    """
+    Prepares everything a sweep point needs from an assembled model: the global matrices without the contributions
+    of the swept elements, the positions of those contributions, and the geometry and properties of the swept elements.
+    Subdivided elements contribute through their sub-elements, which are mapped to the swept elements by owner.
+    """
+    if parameter not in SWEEP_PARAMETERS:
+        raise ValueError(f"Swept parameter must be one of {', '.join(SWEEP_PARAMETERS)}")
+    elset = model.eset
+    swept = [elset.getEntityWithID(id) for id in elementIDs]
+    if not all(swept):
+        raise ValueError(f"Swept elements {elementIDs} must exist")
+    if not elset.assembled:
+        model.assemble()
+    mesh = [sub for elem in swept for sub in elem.getMesh()]
+    owner = np.repeat(np.arange(len(swept)), [len(elem.getMesh()) for elem in swept])
+    edof = np.array([sub.getEdof() for sub in mesh])
+    ex, ey = np.array([sub.getExEy()[0] for sub in mesh]), np.array([sub.getExEy()[1] for sub in mesh])
+    props = {p:np.array([elem.getProp()[p] for elem in swept]) for p in SWEEP_PARAMETERS}
+    Ke, Me = element.beam2dBatch(ex, ey, props['E'][owner], props['A'][owner], props['I'][owner], props['rho'][owner], \
+        elset.massType)
+    K, M = elset.getStiffnessMatrix(), elset.getMassMatrix()
+    if sp.issparse(K):
+        K, M = withPattern(K, edof), withPattern(M, edof)
+    else:
+        K, M = K.copy(), M.copy()
+    data = [A.data if sp.issparse(A) else A.reshape(-1) for A in (K, M)]
+    positions = scatterPositions(K, edof), scatterPositions(M, edof)
+    np.add.at(data[0], positions[0], -Ke.ravel())
+    np.add.at(data[1], positions[1], -Me.ravel())
+    return {'K':K, 'M':M, 'positions':positions, 'ex':ex, 'ey':ey, 'props':props, 'owner':owner, 'parameter':parameter, \
+        'massType':elset.massType, 'bc':solver.gatherConstraints(elset, model.sset), \
+        'engine':engineName, 'nmodes':nmodes}
+
+def sweepMatrices(context, value):
+    """
+    Returns the global matrices (K, M) at the sweep point where the swept property of all swept elements equals value
+    (an array gives one value per swept element)
+    """
+    props = dict(context['props'])
+    props[context['parameter']] = np.broadcast_to(np.asarray(value, dtype=float), props['E'].shape)
+    owner = context['owner']
+    Ke, Me = element.beam2dBatch(context['ex'], context['ey'], props['E'][owner], props['A'][owner], props['I'][owner], \
+        props['rho'][owner], context['massType'])
+    matrices = []
+    for A, positions, Ae in zip((context['K'], context['M']), context['positions'], (Ke, Me)):
+        A = A.copy()
+        np.add.at(A.data if sp.issparse(A) else A.reshape(-1), positions, Ae.ravel())
+        matrices.append(A)
+    return matrices
+
+def trackModes(X0, X1):
+    """
+    Matches the modes X1 (ndof x n_modes) to the modes X0 of the previous sweep point by MAC, see solver.matchModes.
+    Returns (link, values), where mode link[t] of X1 continues mode t of X0 with the MAC value values[t].
+    """
+    _, link, values = solver.matchModes(X0, X1)
+    return link, values
+
+def solveSweepChunk(values, context=None):
+    """
+    Solves the sweep points in order, in a worker process or in the calling process.
+    Returns the frequencies, the links of the modes to the previous point and their MAC values (n_values x n_modes each).
+    """
+    context = WORKER_CONTEXT if context is None else context
+    nmodes, previous = context['nmodes'], None
+    frequencies, links, macs = [], [], []
+    for value in values:
+        K, M = sweepMatrices(context, value)
+        evals, evecs = solver.solveEigenproblem(K, M, context['bc'], context['engine'], nmodes, None, previous)
+        evals, evecs = evals[:nmodes], evecs[:,:nmodes]
+        link, linkMac = (np.arange(evals.shape[0]), np.ones(evals.shape[0])) if previous is None else trackModes(previous, evecs)
+        links.append(link)
+        macs.append(linkMac)
+        frequencies.append(np.sqrt(evals)/(2*np.pi))
+        previous = evecs
+    return np.array(frequencies), np.array(links), np.array(macs)
+
+def initSweepWorker(context):
+    WORKER_CONTEXT.update(context)
+
+def sweepModel(model, elementIDs, parameter, values, engineName='sparse', nmodes=10, workers=None, blasThreads=1, relative=False):
+    """
+    Sweeps the property parameter ('E', 'A', 'I' or 'rho') of the elements with IDs elementIDs of the model over values.
+    If relative is True, values are factors of the current property of each swept element, otherwise absolute values.
+    Contiguous chunks of the points, overlapping by one point for the tracking, are solved across a process pool.
+    Returns the sweep table, a dictionary with
+        values:      swept values (n_values)
+        frequencies: natural frequencies [Hz] in ascending order at each point (n_values x n_modes)
+        order:       order[i, t] is the index of the mode at point i which continues mode t of the first point
+        tracked:     frequencies of the tracked modes (n_values x n_modes), column t follows mode t of the first point
+        mac:         MAC of each tracked mode with the same mode at the previous point (n_values x n_modes);
+    low values flag points where the tracking is uncertain
+    """
+    context = createSweepContext(model, elementIDs, parameter, engineName, nmodes)
+    values = np.asarray(values, dtype=float)
+    points = values[:,None]*context['props'][parameter] if relative else values
+    workers = workers or mp.cpu_count()
+    if workers == 1 or values.size < 2:
+        frequencies, links, macs = solveSweepChunk(points, context)
+    else:
+        bounds = np.linspace(0, values.size - 1, min(workers, values.size - 1) + 1).round().astype(int)
+        with batch.blasThreadLimit(blasThreads), ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'), \
+            initializer=initSweepWorker, initargs=(context,)) as pool:
+            chunks = list(pool.map(solveSweepChunk, [points[start:end+1] for start, end in zip(bounds[:-1], bounds[1:])]))
+        #the first point of each chunk after the first repeats the last point of the previous chunk
+        frequencies, links, macs = [np.vstack([chunks[0][k]] + [chunk[k][1:] for chunk in chunks[1:]]) for k in range(3)]
+    order = np.zeros(links.shape, dtype=int)
+    order[0] = np.arange(links.shape[1])
+    trackedMac = np.ones(links.shape)
+    for i in range(1, links.shape[0]):
+        order[i] = links[i][order[i-1]]
+        trackedMac[i] = macs[i][order[i-1]]
+    tracked = np.take_along_axis(frequencies, order, axis=1)
+    return {'values':values, 'frequencies':frequencies, 'order':order, 'tracked':tracked, 'mac':trackedMac}
+
+def writeSweepTable(path, table, parameter):
+    """
+    Writes the tracked frequencies of the sweep table to a CSV file, one row per sweep point,
+    followed by the MAC of each tracked mode with the previous point
+    """
+    nmodes = table['tracked'].shape[1]
+    header = ','.join([parameter] + [f"mode {t+1} [Hz]" for t in range(nmodes)] + [f"MAC mode {t+1}" for t in range(nmodes)])
+    np.savetxt(path, np.column_stack((table['values'], table['tracked'], table['mac'])), delimiter=',', header=header, \
+        comments='', fmt='%.8g')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep an element property of an eigenHelper model")
+    parser.add_argument('model', help="model file (.json or .npz)")
+    parser.add_argument('-e', '--elements', type=int, nargs='+', required=True, help="IDs of the swept elements")
+    parser.add_argument('-p', '--parameter', choices=SWEEP_PARAMETERS, required=True, help="swept element property")
+    parser.add_argument('--start', type=float, required=True, help="first value of the sweep")
+    parser.add_argument('--stop', type=float, required=True, help="last value of the sweep")
+    parser.add_argument('-n', '--npoints', type=int, default=50, help="number of sweep points (default: 50)")
+    parser.add_argument('--log', action='store_true', help="logarithmically spaced sweep points")
+    parser.add_argument('--relative', action='store_true', help="values are factors of the current element property")
+    parser.add_argument('-o', '--output', default='sweep.csv', help="output CSV file (default: sweep.csv)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument('--blas-threads', type=int, default=1, help="BLAS threads per worker (default: 1)")
+    parser.add_argument('--engine', choices=['dense', 'sparse', 'banded', 'warm'], default='sparse', help="eigensolver (default: sparse)")
+    parser.add_argument('-k', '--nmodes', type=int, default=10, help="number of tracked modes (default: 10)")
+    args = parser.parse_args(argv)
+
+    values = (np.geomspace if args.log else np.linspace)(args.start, args.stop, args.npoints)
+    start = time.perf_counter()
+    try:
+        model = engine.loadModel(args.model)
+        model.assemble(renumber=(args.engine == 'banded'))
+        ok, message = model.check()
+        if not ok:
+            raise ValueError(message)
+        table = sweepModel(model, args.elements, args.parameter, values, args.engine, args.nmodes, args.workers, \
+            args.blas_threads, args.relative)
+    except (OSError, ValueError) as err:
+        print(f"Sweep failed: {err}")
+        return 1
+    writeSweepTable(args.output, table, args.parameter)
+    print(f"Swept {args.parameter} of elements {args.elements} over {values.size} points in {time.perf_counter() - start:.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,36 @@
+import copy
 import numpy as np
+import scipy.sparse as sp
 import calfem.core as cfc
 
 np.set_printoptions(precision=3)
 
 class EntitySet():
+    """
+    Ordered set of entities with hash-indexed lookups.
+    The entities are stored in an insertion-ordered index key -> member; the members list is rebuilt from it
+    on demand after additions or removals, and the maximum key is only rescanned when the current maximum was removed,
+    so that searching, fetching and removing entities take constant time.
+    """
     def __init__(self):
-        self.members=[]
+        self.index={}
+        self._members=[]
+        self._maxID=0
+
+    @property
+    def members(self):
+        if self._members is None:
+            self._members = list(self.index.values())
+        return self._members
+
+    @property
+    def maxID(self):
+        if self._maxID is None:
+            self._maxID = max(self.index.keys(), default=0)
+        return self._maxID
+
+    def getKey(self, entity):
+        return entity.getID()
 
     def printInfo(self, debug=False):
         desc = []
@@ -14,39 +39,99 @@ class EntitySet():
         return desc
 
     def clear(self):
-        self.members=[]
+        self.index={}
+        self._members=[]
+        self._maxID=0
 
     def add(self, newEntity):
-        self.members.append(newEntity)
+        key = self.getKey(newEntity)
+        self.index[key] = newEntity
+        self._members = None
+        if self._maxID is not None:
+            self._maxID = max(self._maxID, key)
 
     def getSize(self):
-        return len(self.members)
+        return len(self.index)
 
     def getNextID(self):
-        maxID = np.NINF
-        for member in self.members:
-            if member.getID() > maxID:
-                maxID = member.getID()
-        if maxID == np.NINF:
-            maxID = 0
-        return maxID + 1
+        return self.maxID + 1
 
     def foundID(self,id):
-        for ind, member in enumerate(self.members):
-            if member.getID() == id:
-                return True, ind
-        return False, np.NAN
+        """
+        Returns (True, entity) if an entity with the given id is in the set, (False, None) otherwise
+        """
+        entity = self.index.get(id)
+        return entity is not None, entity
 
     def deleteEntityWithID(self,id):
-        fnd, ind = self.foundID(id)
-        if fnd:
-            del self.members[ind]
+        entity = self.index.pop(id, None)
+        if entity is None:
+            return
+        self._members = None
+        if id == self._maxID:
+            self._maxID = None
 
     def getEntityWithID(self,id):
-        fnd, ind = self.foundID(id)
-        if not fnd:
-            return False
-        return self.members[ind]
+        return self.index.get(id, False)
+
+    def snapshot(self):
+        """
+        Returns a shallow copy of the set with its own members list and index,
+        which is not affected by later additions and removals of entities.
+        Used to hand a consistent view of the model to background tasks.
+        """
+        view = copy.copy(self)
+        view.index = dict(self.index)
+        view._members = None
+        return view
+
+    def matchesSnapshot(self, view):
+        """
+        Returns True if no entities were added or removed since the snapshot view was taken
+        """
+        return len(view.members) == len(self.members) and all(a is b for a, b in zip(view.members, self.members))
+
+def toDense(A):
+    """
+    Returns A as a dense ndarray, regardless of whether it is stored as a sparse or dense matrix
+    """
+    return A.toarray() if sp.issparse(A) else np.asarray(A)
+
+def extractBlock(A, rows, cols):
+    """
+    Extracts the submatrix A[rows, cols] from a sparse or dense matrix, preserving the storage format
+    """
+    if sp.issparse(A):
+        return A.tocsr()[rows,:][:,cols]
+    return A[np.ix_(rows, cols)]
+
+def isDiagonal(A):
+    """
+    Returns True if the sparse or dense matrix A has no nonzero entries outside its diagonal
+    """
+    if sp.issparse(A):
+        A = A.tocoo()
+        return not np.any(A.data[A.row != A.col])
+    return not np.any(A - np.diag(np.diagonal(A)))
+
+def bandwidth(A):
+    """
+    Returns the half-bandwidth max |i-j| of the nonzero entries A_ij of the sparse or dense matrix A
+    """
+    A = sp.coo_matrix(A)
+    return int(np.max(np.abs(A.row - A.col), initial=0))
+
+def bandedStorage(A, lower, upper, extra=0):
+    """
+    Returns the band of the sparse or dense matrix A with lower and upper bandwidths in LAPACK banded storage,
+    ab[extra + upper + i - j, j] = A[i, j], with extra leading rows of zeros (e.g. the fill-in rows needed by dgbtrf).
+    Entries outside the band are dropped.
+    """
+    A = sp.coo_matrix(A)
+    keep = (A.row - A.col <= lower) & (A.col - A.row <= upper)
+    ab = np.zeros((extra + lower + upper + 1, A.shape[1]))
+    np.add.at(ab, (extra + upper + A.row[keep] - A.col[keep], A.col[keep]), A.data[keep])
+    return ab
 
 def disableAndHide(widget):
     widget.visible = False
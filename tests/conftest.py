@@ -0,0 +1,56 @@
+import os
+import sys
+import pytest
+
+#the app modules import each other as top-level modules, as when served by bokeh
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eigenHelper'))
+
+from utils import *
+import engine
+
+def frameDict(nbays=2, nstoreys=2, span=6.0, height=3.5, E=3e10, A=0.09, I=6.75e-4, rho=2500):
+    """
+    Returns the model dictionary (see modelfile.py) of a regular frame fixed at the base,
+    with slightly varied sections so that its modes are well separated
+    """
+    grid = [(i, j) for j in range(nstoreys+1) for i in range(nbays+1)]
+    ids = {ij:n+1 for n, ij in enumerate(grid)}
+    members = [((i, j), (i, j+1)) for i in range(nbays+1) for j in range(nstoreys)] + \
+        [((i, j), (i+1, j)) for i in range(nbays) for j in range(1, nstoreys+1)]
+    nel = len(members)
+    scale = 1 + 0.1*np.arange(nel)/nel
+    return {
+        'nodes':{'id':list(ids.values()), 'x':[i*span for i, _ in grid], 'y':[j*height for _, j in grid]},
+        'elements':{'id':list(range(1, nel+1)), 'na':[ids[a] for a, _ in members], 'nb':[ids[b] for _, b in members], \
+            'E':[E]*nel, 'A':list(A*scale), 'I':list(I*scale), 'rho':[rho]*nel},
+        'supports':{'node':[ids[(i, 0)] for i in range(nbays+1)], 'type':['S1']*(nbays+1)}
+    }
+
+@pytest.fixture
+def frame():
+    """
+    Builds an unassembled engine.Model of a regular frame, see frameDict
+    """
+    return lambda *args, **kwargs: engine.Model.fromDict(frameDict(*args, **kwargs))
+
+@pytest.fixture
+def matchesDense(frame):
+    """
+    Checks the lowest modes of a frame solved with an engine against those solved with the dense engine
+    """
+    def check(engineName, massType='consistent', renumber=False, nmodes=6):
+        reference = frame(2, 3)
+        reference.setMassType(massType)
+        reference.assemble()
+        reference.solve('dense')
+        model = frame(2, 3)
+        model.setMassType(massType)
+        model.assemble(renumber=renumber)
+        #a previous solution for the 'warm' engine
+        model.solve('sparse', nmodes)
+        model.solve(engineName, nmodes)
+        np.testing.assert_allclose(model.getFrequencies(), reference.getFrequencies()[:nmodes], rtol=1e-8)
+        #mass-normalized modes in the original dof numbering agree up to their sign
+        X, Xref = model.getModes(), reference.getModes()[:,:nmodes]
+        np.testing.assert_allclose(np.abs(np.einsum('ij,ij->j', X, Xref))/np.einsum('ij,ij->j', Xref, Xref), 1, rtol=1e-6)
+    return check
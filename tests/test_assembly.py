@@ -0,0 +1,90 @@
+import pytest
+from utils import *
+import element
+import engine
+
+PROP = {'E':3e10, 'A':0.09, 'I':6.75e-4, 'rho':2500}
+
+def hingedPortal():
+    model = engine.Model()
+    for x, y in [(0, 0), (0, 4), (6, 4), (6, 0)]:
+        model.addNode(x, y)
+    model.addElement(1, 2, **PROP)
+    model.addElement(2, 3, **PROP, hingeA=True, hingeB=True)
+    model.addElement(4, 3, **PROP)
+    model.addSupport(1, 'S1')
+    model.addSupport(4, 'S1')
+    return model
+
+def test_incremental_assembly_matches_fresh_assembly(frame):
+    model = frame(2, 3)
+    model.assemble(sparse=False)
+    model.setElementProperties(2, E=2e10, I=5e-4)
+    model.eset.deleteEntityWithID(7)
+    model.addElement(1, 5, E=3e10, A=0.01, I=1e-5, rho=7800, hingeB=True)
+    fresh = frame(2, 3)
+    fresh.setElementProperties(2, E=2e10, I=5e-4)
+    fresh.eset.deleteEntityWithID(7)
+    fresh.addElement(1, 5, E=3e10, A=0.01, I=1e-5, rho=7800, hingeB=True)
+    fresh.assemble(sparse=False)
+    np.testing.assert_allclose(model.eset.K, fresh.eset.K, atol=1e-6*np.abs(fresh.eset.K).max())
+    np.testing.assert_allclose(model.eset.M, fresh.eset.M, atol=1e-12*np.abs(fresh.eset.M).max())
+
+def test_unchanged_mesh_keeps_the_assembled_matrices():
+    model = hingedPortal()
+    model.assemble()
+    K, M = model.eset.K, model.eset.M
+    element.prepareAssembly(model.nset, model.eset)
+    assert model.eset.assembled and model.eset.K is K and model.eset.M is M
+
+@pytest.mark.parametrize('renumber', [False, True])
+def test_remeshing_an_assembled_set_matches_fresh_assembly(renumber):
+    model = hingedPortal()
+    model.assemble(renumber=renumber)
+    for nsub, elementIDs in [(3, None), (2, [2]), (1, None)]:
+        model.setSubdivision(nsub, elementIDs)
+        element.prepareAssembly(model.nset, model.eset, renumber)
+        assert model.eset.assembled
+        model.solve('dense')
+        fresh = hingedPortal()
+        fresh.eset.nsub = model.eset.nsub
+        for elem, freshElem in zip(model.eset.members, fresh.eset.members):
+            freshElem.nsub = elem.nsub
+        fresh.assemble()
+        fresh.solve('dense')
+        np.testing.assert_allclose(model.getFrequencies(), fresh.getFrequencies(), rtol=1e-9)
+
+def calfemAssembly(eset):
+    """
+    Assembles the global matrices of an element set element by element with cfc.assem, as a reference
+    """
+    ex, ey = eset.getMeshExEy()
+    E, A, I, rho = np.array(eset.getProperties(), dtype=float).reshape(4, -1)[:,eset.getMeshMembers()]
+    edof = eset.getModelEdof()
+    K, M = np.zeros((eset.ndof, eset.ndof)), np.zeros((eset.ndof, eset.ndof))
+    for n in range(edof.shape[0]):
+        Ke, Me = cfc.beam2d(ex[n], ey[n], [E[n], A[n], I[n], rho[n]*A[n]])
+        cfc.assem(edof[n], K, Ke)
+        cfc.assem(edof[n], M, Me)
+    return K, M
+
+#calfem builds its element matrices as np.matrix
+@pytest.mark.filterwarnings('ignore::PendingDeprecationWarning')
+def test_sparse_assembly_matches_calfem(frame):
+    model = frame(6, 8)
+    model.setSubdivision(2)
+    model.assemble()
+    assert model.eset.ndof > element.DENSE_NDOF_LIMIT and sp.issparse(model.eset.K)
+    for step in range(3):
+        if step:
+            #incremental updates scatter into the sparse matrices
+            model.setElementProperties(3 + step, E=2e10, I=5e-4)
+            model.setElementProperties(50 + step, rho=7800)
+            model.eset.deleteEntityWithID(20 + step)
+            model.addElement(step, 8 + step, E=3e10, A=0.01, I=1e-5, rho=7800, hingeB=True)
+            element.prepareAssembly(model.nset, model.eset)
+            model.eset.assemble()
+            assert sp.issparse(model.eset.K)
+        K, M = calfemAssembly(model.eset)
+        np.testing.assert_allclose(model.eset.K.toarray(), K, rtol=1e-12, atol=1e-9*np.abs(K).max())
+        np.testing.assert_allclose(model.eset.M.toarray(), M, rtol=1e-12, atol=1e-12*np.abs(M).max())
@@ -0,0 +1,36 @@
+import json
+import os
+from utils import *
+import batch
+import engine
+from conftest import frameDict
+
+def writeModel(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as modelFile:
+        json.dump(data, modelFile)
+
+def test_output_names_are_unique():
+    paths = ['a/model.json', 'b/model.json', 'b/model.npz', 'b/model-2.json']
+    names = batch.outputNames(paths)
+    assert names[:2] == ['a/model', 'b/model']
+    assert len(set(names)) == len(names)
+
+def test_failing_model_is_reported(tmp_path, monkeypatch):
+    def failingLoad(path):
+        raise RuntimeError("Factor is exactly singular")
+    monkeypatch.setattr(engine, 'loadModel', failingLoad)
+    summary = batch.solveModelFile('model.json', str(tmp_path), 'model')
+    assert not summary['ok'] and 'RuntimeError' in summary['message']
+
+def test_batch_keeps_models_with_the_same_file_name(tmp_path):
+    paths = [str(tmp_path/'a'/'frame.json'), str(tmp_path/'b'/'frame.json'), str(tmp_path/'b'/'broken.json')]
+    writeModel(paths[0], frameDict(1, 1))
+    writeModel(paths[1], frameDict(2, 1))
+    writeModel(paths[2], {'nodes':{'id':[1], 'x':[0]}})
+    summaries = batch.solveBatch(paths, str(tmp_path/'results'), workers=2, engineName='sparse', nmodes=3)
+    assert [(s['model'], s['ok']) for s in summaries] == [('a/frame', True), ('b/broken', False), ('b/frame', True)]
+    assert os.path.exists(tmp_path/'results'/'summary.json')
+    f1 = np.load(tmp_path/'results'/'a'/'frame.npz')['frequencies']
+    f2 = np.load(tmp_path/'results'/'b'/'frame.npz')['frequencies']
+    assert not np.allclose(f1[:3], f2[:3])
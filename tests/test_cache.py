@@ -0,0 +1,32 @@
+import pytest
+from utils import *
+import element
+from test_element import randomElements
+
+def test_cached_matrices_match_batch():
+    ex, ey, E, A, I, rho = randomElements(50, seed=1)
+    for massType in element.MASS_TYPES.values():
+        Kb, Mb = element.beam2dBatch(ex, ey, E, A, I, rho, massType)
+        Kc, Mc = element.ELEMENT_CACHE.getMatrices(ex, ey, E, A, I, rho, massType)
+        assert np.array_equal(np.array(Kc), Kb) and np.array_equal(np.array(Mc), Mb)
+        assert not Kc[0].flags.writeable
+
+@pytest.mark.filterwarnings('ignore::PendingDeprecationWarning')
+def test_identical_elements_share_cached_matrices():
+    cache = element.ElementMatrixCache()
+    ex, ey = np.array([[0, 4], [4, 8], [0, 0]]), np.array([[3, 3], [3, 3], [0, 3]])
+    E, A, I, rho = [np.full(3, p) for p in (3e10, 0.09, 6.75e-4, 2500)]
+    Ke, Me = cache.getMatrices(ex, ey, E, A, I, rho)
+    assert Ke[0] is Ke[1] and Me[0] is Me[1] and Ke[0] is not Ke[2]
+    assert cache.getInfo()['misses'] == 2 and cache.getInfo()['hits'] == 1
+    for n in range(3):
+        Kref, Mref = cfc.beam2d(ex[n], ey[n], [E[n], A[n], I[n], rho[n]*A[n]])
+        np.testing.assert_allclose(Ke[n], Kref, rtol=1e-12, atol=1e-12*np.abs(Kref).max())
+        np.testing.assert_allclose(Me[n], Mref, rtol=1e-12, atol=1e-12*np.abs(Mref).max())
+
+def test_cache_evicts_least_recently_used():
+    cache = element.ElementMatrixCache(maxsize=2)
+    for L in (1.0, 2.0, 1.0, 3.0):
+        cache.getMatrices([0, L], [0, 0], 3e10, 0.09, 6.75e-4, 2500)
+    assert [key[0] for key in cache.entries] == [1.0, 3.0]
+    assert cache.getInfo()['misses'] == 3
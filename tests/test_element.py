@@ -0,0 +1,31 @@
+import pytest
+from utils import *
+import element
+
+def randomElements(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ex, ey = rng.uniform(-5, 5, (n,2)), rng.uniform(-5, 5, (n,2))
+    E, A, I, rho = rng.uniform(1e10, 2e11, n), rng.uniform(1e-3, 1e-1, n), rng.uniform(1e-6, 1e-3, n), rng.uniform(1e3, 8e3, n)
+    return ex, ey, E, A, I, rho
+
+#calfem builds its element matrices as np.matrix
+@pytest.mark.filterwarnings('ignore::PendingDeprecationWarning')
+def test_beam2dBatch_matches_calfem():
+    ex, ey, E, A, I, rho = randomElements(200)
+    Ke, Me = element.beam2dBatch(ex, ey, E, A, I, rho)
+    for n in range(ex.shape[0]):
+        Kref, Mref = cfc.beam2d(ex[n], ey[n], [E[n], A[n], I[n], rho[n]*A[n]])
+        np.testing.assert_allclose(Ke[n], Kref, rtol=1e-12, atol=1e-12*np.abs(Kref).max())
+        np.testing.assert_allclose(Me[n], Mref, rtol=1e-12, atol=1e-12*np.abs(Mref).max())
+
+def test_snapshot_is_stale_after_reassembly(frame):
+    model = frame(1, 1)
+    model.assemble()
+    view = model.eset.snapshot()
+    assert model.eset.matchesSnapshot(view)
+    model.setMassType('lumped')
+    assert not model.eset.matchesSnapshot(view)
+    view = model.eset.snapshot()
+    model.setSubdivision(2)
+    model.assemble()
+    assert not model.eset.matchesSnapshot(view)
@@ -0,0 +1,20 @@
+import pytest
+from utils import *
+
+@pytest.mark.parametrize('engineName, renumber', [('sparse', False), ('banded', True), ('warm', False)])
+def test_lumped_engines_match_dense(matchesDense, engineName, renumber):
+    matchesDense(engineName, 'lumped', renumber)
+
+def test_lumped_mass_is_diagonal_with_the_consistent_translational_mass(frame):
+    model = frame(2, 2)
+    model.assemble(sparse=False)
+    consistent = model.eset.getMassMatrix()
+    model.setMassType('lumped')
+    model.assemble(sparse=False)
+    lumped = model.eset.getMassMatrix()
+    assert isDiagonal(lumped) and np.all(lumped.diagonal() > 0)
+    #unit translations in x and y carry the same total mass with both formulations
+    for direction in range(2):
+        u = np.zeros(lumped.shape[0])
+        u[direction::3] = 1
+        np.testing.assert_allclose(u@lumped@u, u@consistent@u, rtol=1e-12)
@@ -0,0 +1,64 @@
+import pytest
+from utils import *
+import modelfile
+import node
+import engine
+
+def portalDict():
+    #the beam nodes 5 and 6 duplicate the column heads 2 and 3, as in geometry exported from CAD
+    return {
+        'nodes':{'id':[1, 2, 3, 4, 5, 6], 'x':[0, 0, 4, 4, 0, 4+1e-9], 'y':[0, 3, 3, 0, 3, 3]},
+        'elements':{'id':[1, 2, 3, 4], 'na':[1, 5, 4, 2], 'nb':[2, 6, 3, 5], \
+            'E':[3e10]*4, 'A':[1e-3]*4, 'I':[1.7e-6]*4, 'rho':[2500]*4},
+        'supports':{'node':[1, 4], 'type':['S1', 'S1']}
+    }
+
+def test_import_merges_coincident_nodes():
+    nset, eset, sset = modelfile.buildModelSets(portalDict())
+    assert sorted(n.getID() for n in nset.members) == [1, 2, 3, 4]
+    #element 4 between the coincident nodes 2 and 5 is dropped
+    assert [e.getID() for e in eset.members] == [1, 2, 3]
+    assert [n.getID() for n in (eset.getEntityWithID(2).na, eset.getEntityWithID(2).nb)] == [2, 3]
+    assert nset.getEntityWithID(2).getDOFs().tolist() == [4, 5, 6]
+
+def test_imported_duplicate_elements_are_rejected():
+    data = portalDict()
+    data['elements']['na'][3], data['elements']['nb'][3] = 6, 2
+    with pytest.raises(ValueError):
+        modelfile.buildModelSets(data)
+
+def test_findNodesAt_is_symmetric_in_x_and_y():
+    nset = node.NodeSet()
+    nset.add(node.Node(0.0, 0.0, 1))
+    tol = 0.25
+    assert len(nset.findNodesAt(tol, 0.0, tol)) == len(nset.findNodesAt(0.0, tol, tol)) == 1
+
+def twoBayModel():
+    model = engine.Model()
+    for x, y in [(0, 0), (0, 4), (6, 4), (6, 0), (12, 4), (12, 0)]:
+        model.addNode(x, y)
+    model.addElement(1, 2, E=3e10, A=0.09, I=6.75e-4, rho=2500)
+    model.addElement(2, 3, E=2.1e11, A=5e-3, I=8e-5, rho=7850, hingeB=True)
+    model.addElement(4, 3, E=3e10, A=0.12, I=9e-4, rho=2400)
+    model.addElement(3, 5, E=2.1e11, A=4e-3, I=6e-5, rho=7850, hingeA=True, hingeB=True)
+    model.addElement(6, 5, E=3e10, A=0.09, I=6.75e-4, rho=2500)
+    model.addSupport(1, 'S1')
+    model.addSupport(4, 'S2')
+    model.addSupport(6, 'S1')
+    model.setMassType('lumped')
+    model.setSubdivision(2)
+    model.setSubdivision(4, [2])
+    return model
+
+@pytest.mark.parametrize('suffix', ['.json', '.npz'])
+def test_saved_model_has_the_same_frequencies(tmp_path, suffix):
+    model = twoBayModel()
+    path = str(tmp_path / ('model' + suffix))
+    model.save(path)
+    loaded = engine.loadModel(path)
+    assert loaded.toDict() == model.toDict()
+    for m in (model, loaded):
+        m.assemble()
+        assert m.check()[0]
+        m.solve('dense')
+    np.testing.assert_allclose(loaded.getFrequencies(), model.getFrequencies(), rtol=1e-12)
@@ -0,0 +1,31 @@
+from utils import *
+import engine
+import solver
+
+PROP = {'E':3e10, 'A':0.09, 'I':6.75e-4, 'rho':2500}
+
+def test_mode_identity_survives_small_change(frame):
+    model = frame(2, 3)
+    model.assemble()
+    model.solve('sparse', 6)
+    model.setElementProperties(1, I=7e-4)
+    model.solve('sparse', 6)
+    assert np.array_equal(np.sort(model.solution['identity']), np.arange(1, 7))
+
+def test_mode_identity_follows_a_crossing():
+    #two separate cantilever columns, the second one first softer, then stiffer than the first one
+    model = engine.Model()
+    for x in [0, 5]:
+        model.addNode(x, 0)
+        model.addNode(x, 3)
+    model.addElement(1, 2, **PROP)
+    model.addElement(3, 4, **{**PROP, 'I':0.8*PROP['I']})
+    model.addSupport(1, 'S1')
+    model.addSupport(3, 'S1')
+    model.assemble()
+    model.solve('dense')
+    first = model.getModes()[:,0]
+    model.setElementProperties(2, I=1.25*PROP['I'])
+    model.solve('dense')
+    assert model.solution['identity'].tolist()[:2] == [2, 1]
+    assert solver.mac(first[:,None], model.getModes()[:,1:2])[0, 0] > 0.99
@@ -0,0 +1,53 @@
+import pytest
+from utils import *
+import solver
+
+def test_guyan_lowest_modes_are_upper_bounds(frame):
+    model = frame(2, 3)
+    model.setSubdivision(4)
+    model.assemble()
+    model.solve('sparse', 3)
+    full = model.getFrequencies()
+    model.solve('sparse', 3, reduction='guyan')
+    assert np.all(model.getFrequencies() >= full*(1 - 1e-9))
+    assert np.all(model.getReductionError() < 1e-3)
+
+@pytest.mark.parametrize('massType', ['consistent', 'lumped'])
+def test_guyan_matches_the_transformed_matrices(frame, massType, monkeypatch):
+    #blocks of fewer masters than the model has exercise the blockwise condensation
+    monkeypatch.setattr(solver, 'GUYAN_BLOCK', 5)
+    model = frame(2, 2)
+    model.setMassType(massType)
+    model.setSubdivision(2)
+    model.assemble()
+    K, M = toDense(model.eset.getStiffnessMatrix()), toDense(model.eset.getMassMatrix())
+    b = model.sset.gatherConstraints()
+    masters = solver.guyanMasters(model.eset, b)
+    Kr, Mr, reduction = solver.reduceGuyan(K, M, b, masters)
+    m, s = masters - 1, reduction['slaves']
+    T = np.zeros((K.shape[0], m.size))
+    T[m, np.arange(m.size)] = 1
+    T[s,:] = -np.linalg.solve(K[np.ix_(s, s)], K[np.ix_(s, m)])
+    np.testing.assert_allclose(Kr, T.T@K@T, rtol=1e-9, atol=1e-9*np.abs(Kr).max())
+    np.testing.assert_allclose(Mr, T.T@M@T, rtol=1e-9, atol=1e-9*np.abs(Mr).max())
+    Xr = np.random.default_rng(0).standard_normal((m.size, 3))
+    np.testing.assert_allclose(solver.expandGuyan(reduction, Xr, K.shape[0]), T@Xr, atol=1e-12)
+
+def test_guyan_onto_chosen_masters(frame):
+    reference = frame(2, 2)
+    reference.assemble()
+    reference.solve('dense')
+    model = frame(2, 2)
+    #horizontal translations of the nodes, in the dof numbering before renumbering
+    horizontal = [n.getDOFs()[0] for n in model.nset.members]
+    model.assemble(renumber=True)
+    #all dofs as masters reduce nothing
+    model.solve('dense', reduction='guyan', masters=np.arange(1, 28))
+    np.testing.assert_allclose(model.getFrequencies(), reference.getFrequencies(), rtol=1e-9)
+    model.solve('dense', reduction='guyan', masters=horizontal)
+    plain = frame(2, 2)
+    plain.assemble()
+    plain.solve('dense', reduction='guyan', masters=horizontal)
+    assert model.solution['reduction']['masters'] == 6
+    np.testing.assert_allclose(model.getFrequencies(), plain.getFrequencies(), rtol=1e-9)
+    assert np.all(model.getFrequencies() >= reference.getFrequencies()[:6]*(1 - 1e-9))
@@ -0,0 +1,20 @@
+from utils import *
+import engine
+from conftest import frameDict
+
+def test_banded_engine_on_renumbered_dofs_matches_dense(matchesDense):
+    matchesDense('banded', renumber=True)
+
+def test_renumbering_narrows_the_band_of_a_scrambled_frame():
+    data = frameDict(4, 4)
+    #nodes entered in a scrambled order get scattered dof numbers
+    order = np.random.default_rng(0).permutation(len(data['nodes']['id']))
+    data['nodes'] = {key:[values[i] for i in order] for key, values in data['nodes'].items()}
+    plain, renumbered = engine.Model.fromDict(data), engine.Model.fromDict(data)
+    plain.assemble()
+    renumbered.assemble(renumber=True)
+    assert 2*bandwidth(renumbered.eset.getStiffnessMatrix()) < bandwidth(plain.eset.getStiffnessMatrix())
+    for model in (plain, renumbered):
+        model.solve('dense')
+    np.testing.assert_allclose(renumbered.getFrequencies(), plain.getFrequencies(), rtol=1e-9)
+    np.testing.assert_allclose(np.abs(renumbered.getModes()), np.abs(plain.getModes()), atol=1e-9)
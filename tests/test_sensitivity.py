@@ -0,0 +1,25 @@
+import pytest
+from utils import *
+
+def solvedFrame(frame, massType, changes=None):
+    model = frame(2, 2)
+    model.setMassType(massType)
+    model.setSubdivision(2)
+    for id, prop in (changes or {}).items():
+        model.setElementProperties(id, **prop)
+    model.assemble()
+    model.solve('dense')
+    return model
+
+@pytest.mark.parametrize('massType', ['consistent', 'lumped'])
+def test_sensitivities_match_finite_differences(frame, massType):
+    model = solvedFrame(frame, massType)
+    sensitivities = model.getSensitivities()
+    for id in [1, 8]:
+        prop = model.eset.getEntityWithID(id).getProp()
+        for p in ['E', 'A', 'I', 'rho']:
+            h = 1e-4*prop[p]
+            fp = solvedFrame(frame, massType, {id:{p:prop[p] + h}}).getFrequencies()[:6]
+            fm = solvedFrame(frame, massType, {id:{p:prop[p] - h}}).getFrequencies()[:6]
+            np.testing.assert_allclose(sensitivities[p][id-1,:6], (fp - fm)/(2*h), rtol=1e-5, \
+                atol=1e-6*np.abs((fp - fm)/(2*h)).max())
@@ -0,0 +1,81 @@
+import pytest
+from utils import *
+import engine
+
+PROP = {'E':3e10, 'A':0.09, 'I':6.75e-4, 'rho':2500}
+
+def beamModel(xb, yb, supports):
+    model = engine.Model()
+    model.addNode(0, 0)
+    model.addNode(xb, yb)
+    model.addElement(1, 2, **PROP)
+    for nodeID, supportType in supports:
+        model.addSupport(nodeID, supportType)
+    model.assemble()
+    return model
+
+@pytest.mark.parametrize('xb, yb, supports', [
+    (4, 0, [(1, 'S5'), (2, 'S5')]),
+    (0, 3, [(1, 'S6')]),
+])
+def test_mechanism_with_exactly_singular_stiffness(xb, yb, supports):
+    ok, message = beamModel(xb, yb, supports).check()
+    assert not ok
+    assert 'Mechanism' in message
+
+def test_supported_beam_passes_check():
+    ok, _ = beamModel(4, 0, [(1, 'S1'), (2, 'S5')]).check()
+    assert ok
+
+def hingedPortalReference(span, height):
+    """
+    Portal frame with fixed bases and a beam hinged at both ends, modelled with calfem by giving the beam ends
+    their own rotation dofs 13 and 14 (duplicate nodes sharing the translations)
+    """
+    edof = np.array([[1, 2, 3, 4, 5, 6], [4, 5, 13, 7, 8, 14], [10, 11, 12, 7, 8, 9]])
+    ex = np.array([[0, 0], [0, span], [span, span]])
+    ey = np.array([[0, height], [height, height], [0, height]])
+    K, M = np.zeros((14,14)), np.zeros((14,14))
+    for eltopo, iex, iey in zip(edof, ex, ey):
+        Ke, Me = cfc.beam2d(iex, iey, [PROP['E'], PROP['A'], PROP['I'], PROP['rho']*PROP['A']])
+        cfc.assem(eltopo, K, Ke)
+        cfc.assem(eltopo, M, Me)
+    L, _ = cfc.eigen(K, M, np.array([1, 2, 3, 10, 11, 12]))
+    return np.sqrt(L)/(2*np.pi)
+
+@pytest.mark.filterwarnings('ignore::PendingDeprecationWarning')
+@pytest.mark.parametrize('renumber', [False, True])
+def test_hinged_portal_matches_duplicate_node_model(renumber):
+    model = engine.Model()
+    for x, y in [(0, 0), (0, 4), (6, 4), (6, 0)]:
+        model.addNode(x, y)
+    model.addElement(1, 2, **PROP)
+    model.addElement(2, 3, **PROP, hingeA=True, hingeB=True)
+    model.addElement(4, 3, **PROP)
+    model.addSupport(1, 'S1')
+    model.addSupport(4, 'S1')
+    model.assemble(renumber=renumber)
+    assert model.check()[0]
+    model.solve('dense')
+    np.testing.assert_allclose(model.getFrequencies(), hingedPortalReference(6, 4), rtol=1e-9)
+
+def test_sparse_engine_matches_dense(matchesDense):
+    matchesDense('sparse')
+
+@pytest.mark.parametrize('massType', ['consistent', 'lumped'])
+@pytest.mark.parametrize('engineName, renumber', [('dense', False), ('sparse', False), ('banded', True)])
+def test_engines_return_the_lowest_modes_within_the_band(frame, massType, engineName, renumber):
+    reference = frame(3, 4)
+    reference.setMassType(massType)
+    reference.assemble()
+    reference.solve('dense')
+    fref = reference.getFrequencies()
+    #the lower band limit lies above ten modes, more than the number of requested modes
+    fmin = (fref[9] + fref[10])/2
+    model = frame(3, 4)
+    model.setMassType(massType)
+    model.assemble(renumber=renumber)
+    model.solve(engineName, 6, band=(fmin, np.inf))
+    np.testing.assert_allclose(model.getFrequencies()[:6], fref[10:16], rtol=1e-8)
+    model.solve(engineName, 6, band=(fmin, (fref[12] + fref[13])/2))
+    np.testing.assert_allclose(model.getFrequencies(), fref[10:13], rtol=1e-8)
@@ -0,0 +1,37 @@
+from utils import *
+import engine
+import solver
+
+def test_subdivision_matches_entered_mesh(frame):
+    model = frame(1, 1)
+    model.setSubdivision(2)
+    model.assemble()
+    model.solve('dense')
+    data = frame(1, 1).toDict()
+    nodes, elements = data['nodes'], data['elements']
+    meshed = engine.Model()
+    for id, x, y in zip(nodes['id'], nodes['x'], nodes['y']):
+        meshed.addNode(x, y, id)
+    coords = {id:(x, y) for id, x, y in zip(nodes['id'], nodes['x'], nodes['y'])}
+    mid = [meshed.addNode((coords[na][0] + coords[nb][0])/2, (coords[na][1] + coords[nb][1])/2) \
+        for na, nb in zip(elements['na'], elements['nb'])]
+    for n, (na, nb) in enumerate(zip(elements['na'], elements['nb'])):
+        prop = {p:elements[p][n] for p in ('E', 'A', 'I', 'rho')}
+        meshed.addElement(na, mid[n], **prop)
+        meshed.addElement(mid[n], nb, **prop)
+    for nodeID, supportType in zip(data['supports']['node'], data['supports']['type']):
+        meshed.addSupport(nodeID, supportType)
+    meshed.assemble()
+    meshed.solve('dense')
+    np.testing.assert_allclose(model.getFrequencies(), meshed.getFrequencies(), rtol=1e-9)
+
+def test_sensitivities_of_a_solution_survive_remeshing(frame):
+    model = frame(1, 1)
+    model.assemble()
+    solution = model.solve('dense')
+    before = solver.computeSensitivities(solution)
+    model.setSubdivision(3)
+    model.assemble()
+    after = solver.computeSensitivities(solution)
+    for parameter, values in before.items():
+        np.testing.assert_allclose(after[parameter], values)
@@ -0,0 +1,61 @@
+import pytest
+from utils import *
+import engine
+import sweep
+
+PROP = {'E':3e10, 'A':0.09, 'I':6.75e-4, 'rho':2500}
+
+def twoColumns():
+    #two separate cantilever columns, whose lowest bending modes cross when the inertia of the second one is swept
+    model = engine.Model()
+    for x in [0, 5]:
+        model.addNode(x, 0)
+        model.addNode(x, 3)
+    model.addElement(1, 2, **PROP)
+    model.addElement(3, 4, **PROP)
+    model.addSupport(1, 'S1')
+    model.addSupport(3, 'S1')
+    model.setSubdivision(4)
+    return model
+
+@pytest.mark.parametrize('sparse', [True, False])
+def test_sweep_matrices_match_assembly(frame, sparse):
+    model = frame(2, 2)
+    model.setSubdivision(2)
+    model.assemble(sparse=sparse)
+    context = sweep.createSweepContext(model, [2, 7], 'I')
+    K, M = sweep.sweepMatrices(context, [1e-3, 2e-4])
+    for id, I in [(2, 1e-3), (7, 2e-4)]:
+        model.setElementProperties(id, I=I)
+    np.testing.assert_allclose(toDense(K), toDense(model.eset.getStiffnessMatrix()), rtol=1e-12, atol=1e-3)
+    np.testing.assert_allclose(toDense(M), toDense(model.eset.getMassMatrix()), rtol=1e-12, atol=1e-9)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sweep_matches_direct_solutions(frame, workers):
+    values = np.linspace(0.5, 2, 5)
+    model = frame(2, 2)
+    model.assemble()
+    table = sweep.sweepModel(model, [1, 2], 'E', values, nmodes=4, workers=workers, relative=True)
+    for value, frequencies in zip(values, table['frequencies']):
+        direct = frame(2, 2)
+        for id in [1, 2]:
+            direct.setElementProperties(id, E=value*PROP['E'])
+        direct.assemble()
+        direct.solve('sparse', 4)
+        np.testing.assert_allclose(frequencies, direct.getFrequencies(), rtol=1e-8)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sweep_tracks_modes_across_a_crossing(workers):
+    model = twoColumns()
+    model.assemble()
+    #the points step over the crossing at 1, where the modes are degenerate
+    table = sweep.sweepModel(model, [2], 'I', np.linspace(0.5, 2, 6), nmodes=2, workers=workers, relative=True)
+    reference = twoColumns()
+    reference.assemble()
+    reference.solve('sparse', 2)
+    f = reference.getFrequencies()[0]
+    #the first column keeps its frequency, the second one scales with the square root of its inertia
+    np.testing.assert_allclose(table['tracked'][:,1], f, rtol=1e-8)
+    np.testing.assert_allclose(table['tracked'][:,0], f*np.sqrt(table['values']), rtol=1e-6)
+    assert np.all(table['order'][-1] == [1, 0])
+    assert np.all(table['mac'] > 0.99)
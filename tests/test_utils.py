@@ -0,0 +1,29 @@
+import time
+from utils import *
+import node
+
+def test_entity_set_keeps_insertion_order_after_deletions():
+    nset = EntitySet()
+    for id in [3, 1, 4, 5, 2]:
+        nset.add(node.Node(0, id, id))
+    view = nset.snapshot()
+    nset.deleteEntityWithID(5)
+    nset.deleteEntityWithID(1)
+    assert [n.getID() for n in nset.members] == [3, 4, 2]
+    assert nset.getNextID() == 5
+    assert not nset.matchesSnapshot(view)
+    assert [n.getID() for n in view.members] == [3, 1, 4, 5, 2]
+    nset.add(node.Node(0, 0, 7))
+    assert nset.getSize() == 4 and nset.getNextID() == 8
+
+def test_entity_set_deletes_in_constant_time():
+    def deleteAll(n):
+        nset = EntitySet()
+        for id in range(1, n+1):
+            nset.add(node.Node(0, id, id))
+        start = time.perf_counter()
+        for id in range(n, 0, -1):
+            nset.deleteEntityWithID(id)
+        return time.perf_counter() - start
+    #a linear scan per deletion would make the tenfold set take about a hundred times longer
+    assert deleteAll(100000) < 30*max(deleteAll(10000), 1e-4)
@@ -0,0 +1,22 @@
+from utils import *
+
+def test_warm_engine_matches_dense(matchesDense):
+    matchesDense('warm')
+
+def test_warm_engine_keeps_the_signs_of_the_previous_modes(frame):
+    model = frame(2, 3)
+    model.assemble()
+    model.solve('sparse', 6)
+    previous = model.getModes()
+    model.setElementProperties(1, I=7e-4)
+    model.solve('warm', 6)
+    assert np.all(np.einsum('ij,ij->j', previous, toDense(model.eset.getMassMatrix())@model.getModes()) > 0)
+
+def test_warm_engine_falls_back_without_a_previous_solution(frame):
+    model = frame(2, 3)
+    model.assemble()
+    model.solve('warm', 6)
+    reference = frame(2, 3)
+    reference.assemble()
+    reference.solve('sparse', 6)
+    np.testing.assert_allclose(model.getFrequencies(), reference.getFrequencies(), rtol=1e-10)